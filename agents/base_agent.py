@@ -1,54 +1,89 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
-from memory.memory_interface import MemoryInterface
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Union
+from memory.memory_interface import MemoryInterface, memory_key, merge_messages
+from memory.async_memory_interface import AsyncMemoryInterface, call_memory
+from memory.message import Message
+from agents.response_cache import get_response_cache
+from tools.registry import ToolRegistry
+from agents.tool_executor import ToolExecutor
+
+AnyMemory = Union[MemoryInterface, AsyncMemoryInterface]
 
 class BaseAgent(ABC):
 
     def __init__(self,
-                 short_term_memory: MemoryInterface,
-                 long_term_memory: MemoryInterface,
-                 tools: List[Any] = None):
+                 short_term_memory: AnyMemory,
+                 long_term_memory: AnyMemory,
+                 tools: Union[ToolRegistry, List[Any]] = None):
         self.short_term_memory = short_term_memory
         self.long_term_memory = long_term_memory
-        self.tools = tools or []
-        self.conversation_id = None
+        # Specs and the name index are built once, shared registries are reused as is
+        self.tool_registry = tools if isinstance(tools, ToolRegistry) else ToolRegistry(tools or [])
+        self.tools = list(self.tool_registry)
+        self.tool_executor = ToolExecutor(self.tool_registry)
+        # Agents are shared between concurrent requests, so the active
+        # conversation is tracked per asyncio task instead of on the instance.
+        self._conversation_id: ContextVar[Optional[str]] = ContextVar(
+            f"{type(self).__name__}_conversation_id", default=None
+        )
+
+    @property
+    def conversation_id(self) -> Optional[str]:
+        return self._conversation_id.get()
 
     def set_conversation_id(self, conversation_id: str):
-        self.conversation_id = conversation_id
+        self._conversation_id.set(conversation_id)
 
-    def save_to_memory(self, data: Dict[str, Any],long_term: bool = False) -> bool:
+    async def save_to_memory(self, data: Union[Dict[str, Any], Message],long_term: bool = False) -> bool:
         if not self.conversation_id:
             raise ValueError("Conversation ID not set")
         
-        key = f"{self.conversation_id}:{data.get('timestamp', 'unknown')}"
-        short_term_saved = self.short_term_memory.save(key,data)
+        key = memory_key(self.conversation_id, data)
+        # Short-term memory keeps the record itself, with its converted provider message
+        short_term_saved = await call_memory(self.short_term_memory, "save", key, data)
 
         long_term_saved = True
         if long_term:
-            long_term_saved = self.long_term_memory.save(key,data)
+            # With a WriteBehindMemory this only queues the write
+            long_term_saved = await call_memory(self.long_term_memory, "save", key, dict(data))
         
         return short_term_saved and long_term_saved
 
-    def retrieve_memory(self, query: Dict[str,Any], use_long_term: bool = False) -> List[Dict[str,Any]]:
+    async def retrieve_memory(self, query: Dict[str,Any], use_long_term: bool = False, limit: Optional[int] = None) -> List[Dict[str,Any]]:
+        """
+        Look up entries in short-term memory and optionally long-term memory.
+
+        Results are ordered by timestamp, oldest first. With a limit, the newest
+        limit entries are returned newest first, and each store is only asked
+        for its own newest limit.
+        """
         if not self.conversation_id:
             raise ValueError("Conversation ID not set")
-        short_term_results = self.short_term_memory.search(query)
-
-        if use_long_term:
-            long_term_results = self.long_term_memory.search(query)
+        descending = limit is not None
+        if not use_long_term:
+            return await call_memory(self.short_term_memory, "search", query, limit=limit, descending=descending)
 
-            seen_keys = set()
-            combined_results = []
+        short_term_results, long_term_results = await asyncio.gather(
+            call_memory(self.short_term_memory, "search", query, limit=limit, descending=descending),
+            call_memory(self.long_term_memory, "search", query, limit=limit, descending=descending)
+        )
 
-            for result in short_term_results + long_term_results:
-                result_tuple = tuple(sorted(result.items()))
+        # Both lists arrive sorted, short-term copies win over long-term duplicates
+        return merge_messages([short_term_results, long_term_results], descending=descending, limit=limit)
 
-                if result_tuple not in seen_keys:
-                    seen_keys.add(result_tuple)
-                    combined_results.append(result)
-            
-            return combined_results
-        return short_term_results
+    async def invoke_model(self, messages: List[Any], use_tools: bool = False) -> Any:
+        """
+        Call the provider through the shared response cache, identical calls for
+        self.model are answered once. With use_tools, self.tool_client (the client
+        with the registry's specs bound) is called instead of self.client.
+        """
+        if use_tools:
+            return await get_response_cache().ainvoke(
+                self.tool_client, self.model, messages, tools=self.tool_registry.specs_json
+            )
+        return await get_response_cache().ainvoke(self.client, self.model, messages)
     
     @abstractmethod
     async def process(self, user_input: str) -> Dict[str, Any]:
@@ -66,8 +101,5 @@ class BaseAgent(ABC):
         ]
     
     def _get_tool_by_name(self, name: str) -> Any:
-        for tool in self.tools:
-            if tool.name == name:
-                return tool
-        return None
+        return self.tool_registry.get(name)
     
\ No newline at end of file
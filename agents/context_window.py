@@ -0,0 +1,143 @@
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+from memory.message import Message
+from config.logger import get_logger
+from config.settings import get_settings
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = get_logger(__name__)
+
+# Context window sizes of the models the agents use, in tokens
+MODEL_CONTEXT_TOKENS = {
+    "gpt-4o": 128000,
+    "llama3-70b-8192": 8192,
+}
+DEFAULT_CONTEXT_TOKENS = 8192
+
+# Role and framing tokens each chat message adds on top of its content
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Approximate characters per token when no tokenizer is installed
+CHARS_PER_TOKEN = 4
+
+class TokenCounter:
+    """Counts tokens locally, with the model's tiktoken encoding when available."""
+
+    def __init__(self, model: str):
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = self._load_encoding(model)
+            except Exception as e:
+                # Encodings are downloaded on first use, without network access fall back to the estimate
+                logger.warning(f"Could not load a tiktoken encoding for {model}, estimating tokens instead: {e}")
+        self.name = self._encoding.name if self._encoding is not None else "approx"
+
+    @staticmethod
+    def _load_encoding(model: str):
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            # Not an OpenAI model, cl100k is close enough for budgeting
+            return tiktoken.get_encoding("cl100k_base")
+
+    def count(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return -(-len(text) // CHARS_PER_TOKEN)
+
+    def count_message(self, message: Message) -> int:
+        return MESSAGE_OVERHEAD_TOKENS + self.count(str(message.get("content", "")))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Keep the end of text within max_tokens, the most recent part of a turn matters most."""
+        if max_tokens <= 0:
+            return ""
+        if self._encoding is not None:
+            tokens = self._encoding.encode(text, disallowed_special=())
+            return text if len(tokens) <= max_tokens else self._encoding.decode(tokens[-max_tokens:])
+        return text[-max_tokens * CHARS_PER_TOKEN:]
+
+@lru_cache(maxsize=None)
+def get_token_counter(model: str) -> TokenCounter:
+    return TokenCounter(model)
+
+class ContextWindow:
+    """
+    Builds the provider message list for a turn within a token budget.
+
+    Pinned messages (those saved with pinned=True) and the new message always go
+    in. The rest of the history is added newest first until the budget runs
+    out. The turn at the boundary is cut to the tokens left when at least
+    min_truncated_tokens remain, and everything older is replaced by one short
+    note saying how many messages were left out. Token counts are cached on
+    the Message records, so only messages new to this process are tokenized.
+    """
+
+    def __init__(self, model: str, budget: Optional[int] = None, response_reserve: Optional[int] = None,
+                 min_truncated_tokens: int = 64):
+        settings = get_settings()
+        reserve = response_reserve if response_reserve is not None else settings.context_response_reserve
+        window = MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS) - reserve
+        budget = budget or settings.context_token_budget
+        self.budget = min(window, budget) if budget else window
+        self.counter = get_token_counter(model)
+        self.min_truncated_tokens = min_truncated_tokens
+
+    def _omitted_note(self, count: int) -> Message:
+        return Message(role="system", content=f"[{count} earlier messages omitted to fit the context window]")
+
+    def build(self, history: List[Any], new_message: Message) -> List[Any]:
+        """Provider messages for history (oldest first) followed by new_message."""
+        records = [Message.coerce(entry) for entry in history]
+        records = [record for record in records if record.to_provider() is not None]
+
+        pinned = [index for index, record in enumerate(records) if record.get("pinned")]
+        remaining = self.budget - new_message.token_count(self.counter)
+        remaining -= sum(records[index].token_count(self.counter) for index in pinned)
+
+        # Room for the note about omitted messages is held back while older ones remain
+        note_tokens = self._omitted_note(len(records)).token_count(self.counter)
+        selected: Dict[int, Message] = {index: records[index] for index in pinned}
+        candidates = [index for index in range(len(records) - 1, -1, -1) if index not in selected]
+        omitted = 0
+
+        for position, index in enumerate(candidates):
+            record = records[index]
+            tokens = record.token_count(self.counter)
+            older = len(candidates) - position - 1
+            if tokens <= remaining - (note_tokens if older else 0):
+                selected[index] = record
+                remaining -= tokens
+                continue
+
+            # The first turn that does not fit is cut to what is left, everything older is dropped
+            available = remaining - note_tokens - MESSAGE_OVERHEAD_TOKENS
+            if available >= self.min_truncated_tokens:
+                content = self.counter.truncate(str(record.get("content", "")), available)
+                selected[index] = Message(**{**record, "content": content})
+                remaining -= available + MESSAGE_OVERHEAD_TOKENS
+                omitted = older
+            else:
+                omitted = older + 1
+            break
+
+        if omitted:
+            logger.debug(f"Context window: {omitted} older messages omitted, {self.budget - remaining} of {self.budget} tokens used")
+
+        # The note goes where the omitted turns were, after any pinned messages older than them
+        messages = []
+        note_pending = bool(omitted)
+        for index in sorted(selected):
+            if note_pending and not records[index].get("pinned"):
+                messages.append(self._omitted_note(omitted).to_provider())
+                note_pending = False
+            messages.append(selected[index].to_provider())
+        if note_pending:
+            messages.append(self._omitted_note(omitted).to_provider())
+        messages.append(new_message.to_provider())
+        return messages
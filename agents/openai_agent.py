@@ -1,27 +1,29 @@
 import time
 import json
 import uuid
-from config.logger import Logging
+from config.logger import get_logger
 from typing import Dict, Any, List
 from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage, AIMessage, SystemMessage
 from agents.base_agent import BaseAgent
+from agents.context_window import ContextWindow
 from memory.memory_interface import MemoryInterface
-from config.settings import OPENAI_API_KEY, MONGODB_URI,MONGODB_LOG_DB, MONGODB_LOG_COLLECTION
+from memory.message import Message
+from config.settings import get_settings
 
-# Configure logging
-logger_obj = Logging(MONGODB_URI,MONGODB_LOG_DB,MONGODB_LOG_COLLECTION)
-logger=logger_obj.setup_logger()
+logger = get_logger(__name__)
 
 class OpenAIAgent(BaseAgent):
     def __init__(self, short_term_memory, long_term_memory, tools=None, model: str = "gpt-4o"):
         super().__init__(short_term_memory, long_term_memory, tools)
         logger.info(f"Initializing OpenAIAgent with model: {model}")
+        self.model = model
         self.client = ChatOpenAI(
-            api_key=OPENAI_API_KEY,
+            api_key=get_settings().openai_api_key,
             model=model,
             temperature=0.7
         )
+        self.context_window = ContextWindow(model)
+        self.tool_client = self.tool_registry.bind(self.client)
 
     async def process(self, user_input):
         logger.info("Starting processing with OpenAI Agent")
@@ -31,78 +33,32 @@ class OpenAIAgent(BaseAgent):
                 logger.info(f"Created new conversation ID: {self.conversation_id}")
             
             logger.info(f"Retrieving memory for conversation: {self.conversation_id}")
-            history = self.retrieve_memory({"conversation_id": self.conversation_id})
-            history.sort(key=lambda x: x.get("timestamp", 0))
+            # Short-term memory returns a conversation's history already ordered by timestamp
+            history = await self.retrieve_memory({"conversation_id": self.conversation_id})
             
             logger.debug(f"Memory history contains {len(history)} entries")
-            messages = []
-
-            for entry in history:
-                role = entry.get("role", "user")
-                content = entry.get("content", "")
-                
-                logger.debug(f"Adding message with role: {role}, content preview: {content[:50]}...")
-                
-                if role == "user":
-                    messages.append(HumanMessage(content=content))
-                elif role == "assistant":
-                    messages.append(AIMessage(content=content))
-                elif role == "system":
-                    messages.append(SystemMessage(content=content))
-
             logger.info(f"Adding user input to messages. Preview: {user_input[:50]}...")
-            messages.append(HumanMessage(content=user_input))
-            timestamp = time.time()
+            user_message = Message(
+                conversation_id=self.conversation_id,
+                role="user",
+                content=user_input,
+                timestamp=time.time()
+            )
+            # Newest history that fits the model's token budget, provider messages
+            # and token counts are reused from the records held in short-term memory
+            messages = self.context_window.build(history, user_message)
+            logger.debug(f"Sending {len(messages)} of {len(history) + 1} messages")
 
             logger.info("Saving user message to memory")
-            self.save_to_memory({
-                "conversation_id": self.conversation_id,
-                "role": "user",
-                "content": user_input,
-                "timestamp": timestamp
-            })
-
-            tools_for_langchain = []
-            tool_map = {}
+            await self.save_to_memory(user_message, long_term=True)
 
-            if self.tools:
-                logger.info(f"Preparing {len(self.tools)} tools for use")
-                try:
-                    for tool in self.tools:
-                        tool_name = tool.name
-                        tool_description = tool.description
-                        logger.debug(f"Adding tool: {tool_name}")
-                        
-                        tool_map[tool_name] = tool
-                        
-                        tool_spec = {
-                            "type": "function",
-                            "function": {
-                                "name": tool_name,
-                                "description": tool_description,
-                                "parameters": tool.args_schema.schema() if hasattr(tool, 'args_schema') else {"type": "object", "properties": {}}
-                            }
-                        }
-                        tools_for_langchain.append(tool_spec)
-                    
-                    logger.debug(f"Tools map: {list(tool_map.keys())}")
-                    logger.debug(f"First tool spec: {json.dumps(tools_for_langchain[0], indent=2)}")
-                except Exception as e:
-                    logger.error(f"Error preparing tools: {str(e)}")
-                    import traceback
-                    logger.error(traceback.format_exc())
-            else:
-                logger.info("No tools available for this agent")
-
-            if tools_for_langchain:
+            # Tool specs were prepared and bound to self.tool_client at init
+            if self.tool_client is not None:
                 logger.info("Invoking OpenAI with tools")
                 try:
-                    logger.debug(f"Sending {len(messages)} messages to OpenAI with {len(tools_for_langchain)} tools")
+                    logger.debug(f"Sending {len(messages)} messages to OpenAI with {len(self.tool_registry)} tools")
                     
-                    response = self.client.invoke(
-                        messages,
-                        tools=tools_for_langchain
-                    )
+                    response = await self.invoke_model(messages, use_tools=True)
                     logger.debug(f"Response received. {response}")
                     logger.debug(f"Response Type: {type(response)}")
                     
@@ -111,7 +67,7 @@ class OpenAIAgent(BaseAgent):
                     
                     if tool_calls:
                         logger.info(f"Found {len(tool_calls)} tool calls")
-                        tool_results = []
+                        calls = []
                         
                         for i, tool_call in enumerate(tool_calls):
                             logger.info(f"Processing tool call {i+1}")
@@ -122,12 +78,12 @@ class OpenAIAgent(BaseAgent):
                             else:
                                 tool_name = getattr(tool_call, "name", None)
                                 tool_args = getattr(tool_call, "args", {})
-                                if isinstance(tool_args, str):
-                                    try:
-                                        tool_args = json.loads(tool_args)
-                                    except:
-                                        logger.warning(f"Could not parse tool args JSON: {tool_args}")
-                                        tool_args = {}
+                            if isinstance(tool_args, str):
+                                try:
+                                    tool_args = json.loads(tool_args)
+                                except:
+                                    logger.warning(f"Could not parse tool args JSON: {tool_args}")
+                                    tool_args = {}
                             
                             logger.info(f"Tool name: {tool_name}")
                             logger.debug(f"Tool arguments: {tool_args}")
@@ -136,47 +92,23 @@ class OpenAIAgent(BaseAgent):
                                 logger.warning("Tool name is missing, skipping this tool call")
                                 continue
                                 
-                            tool = tool_map.get(tool_name)
-
-                            if tool:
-                                try:
-                                    logger.info(f"Executing tool: {tool_name}")
-                                    
-                                    if isinstance(tool_args, str):
-                                        tool_args = json.loads(tool_args)
+                            tool = self.tool_registry.get(tool_name)
+                            if tool is None:
+                                logger.warning(f"Tool '{tool_name}' not found in tool registry")
+                                continue
+                            calls.append((tool_name, tool, tool_args))
 
-                                    try:
-                                        result = tool.run(tool_args)
-                                    except Exception as e:
-                                        logger.error(f"Error executing tool: {e}")
-                                    logger.info(f"Tool execution successful: {result}")
-                                    
-                                    tool_results.append({
-                                        "tool_name": tool_name,
-                                        "input": tool_args,
-                                        "output": result
-                                    })
-                                except Exception as e:
-                                    logger.error(f"Error executing tool: {str(e)}")
-                                    import traceback
-                                    logger.error(traceback.format_exc())
-                                    
-                                    tool_results.append({
-                                        "tool_name": tool_name,
-                                        "input": tool_args,
-                                        "error": str(e)
-                                    })
-                            else:
-                                logger.warning(f"Tool '{tool_name}' not found in tool map")
+                        # Calls run concurrently, results come back in call order
+                        tool_results = await self.tool_executor.run_all(calls)
                         
                         logger.info("Saving assistant response with tool results to memory")
-                        self.save_to_memory({
-                            "conversation_id": self.conversation_id,
-                            "role": "assistant",
-                            "content": content,
-                            "tool_results": tool_results,
-                            "timestamp": time.time()
-                        }, long_term=True)
+                        await self.save_to_memory(Message(
+                            conversation_id=self.conversation_id,
+                            role="assistant",
+                            content=content,
+                            tool_results=tool_results,
+                            timestamp=time.time()
+                        ), long_term=True)
 
                         return {
                             "content": content,
@@ -186,12 +118,12 @@ class OpenAIAgent(BaseAgent):
                         logger.info("No tool calls in response")
                         
                         logger.info("Saving assistant response to memory")
-                        self.save_to_memory({
-                            "conversation_id": self.conversation_id,
-                            "role": "assistant",
-                            "content": content,
-                            "timestamp": time.time()
-                        }, long_term=True)
+                        await self.save_to_memory(Message(
+                            conversation_id=self.conversation_id,
+                            role="assistant",
+                            content=content,
+                            timestamp=time.time()
+                        ), long_term=True)
                     
                         return {"content": content}
                         
@@ -202,17 +134,17 @@ class OpenAIAgent(BaseAgent):
                     raise
             
             logger.info("Invoking OpenAI without tools or no tool calls were made")
-            response = self.client.invoke(messages)
+            response = await self.invoke_model(messages)
             content = response.content
             logger.info(f"Response received. Content preview: {content[:50]}...")
 
             logger.info("Saving assistant response to memory")
-            self.save_to_memory({
-                "conversation_id": self.conversation_id,
-                "role": "assistant",
-                "content": content,
-                "timestamp": time.time()
-            }, long_term=True)
+            await self.save_to_memory(Message(
+                conversation_id=self.conversation_id,
+                role="assistant",
+                content=content,
+                timestamp=time.time()
+            ), long_term=True)
         
             return {"content": content}
             
@@ -223,11 +155,11 @@ class OpenAIAgent(BaseAgent):
             
             error_message = f"Error processing with OpenAI: {str(e)}"
 
-            self.save_to_memory({
-                "conversation_id": self.conversation_id,
-                "role": "system",
-                "content": error_message,
-                "timestamp": time.time()
-            })
+            await self.save_to_memory(Message(
+                conversation_id=self.conversation_id,
+                role="system",
+                content=error_message,
+                timestamp=time.time()
+            ))
 
             return {"error": error_message}
\ No newline at end of file
@@ -1,18 +1,17 @@
 import uuid
 import asyncio
 from enum import Enum
-from typing import Dict, List, Any, Optional
+from typing import AsyncIterator, Dict, List, Any, Optional
 from typing_extensions import TypedDict
 from datetime import datetime
 import langsmith
 from langgraph.graph import StateGraph, END
-from pydantic import BaseModel, Field
-from config.logger import Logging
-from config.settings import MONGODB_URI,MONGODB_LOG_DB, MONGODB_LOG_COLLECTION
+from pydantic import BaseModel, ConfigDict, Field
+from memory.message import Message
+from config.logger import get_logger
+from config.settings import get_settings
 
-# Configure logging
-logger_obj = Logging(MONGODB_URI,MONGODB_LOG_DB,MONGODB_LOG_COLLECTION)
-logger=logger_obj.setup_logger()
+logger = get_logger(__name__)
 
 
 class AgentType(str, Enum):
@@ -21,11 +20,13 @@ class AgentType(str, Enum):
 
 class Memory(TypedDict):
     conversation_id: str
-    history: List[Dict[str, Any]]
-    short_term: Dict[str, Any]
-    long_term: Dict[str, Any]
+    history: List[Message]
+    short_term: Dict[str, Message]
+    long_term: Dict[str, Message]
 
 class AgentState(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     agent_type: AgentType = Field(default=AgentType.OPENAI)
     user_input: str = Field(default="")
     system_message: Optional[str] = Field(default=None)
@@ -79,16 +80,14 @@ class Orchestrator:
     async def _process_input(self, state: AgentState) -> AgentState:
         current_time = datetime.now().isoformat()
 
-        state.memory["history"].append({
-            "role": "user",
-            "content": state.user_input,
-            "timestamp": current_time
-        })
-
-        state.memory["short_term"][current_time] = {
-            "role": "user",
-            "content": state.user_input
-        }
+        message = Message(
+            conversation_id=state.memory["conversation_id"],
+            role="user",
+            content=state.user_input,
+            timestamp=current_time
+        )
+        state.memory["history"].append(message)
+        state.memory["short_term"][current_time] = message
 
         logger.debug(f"Processing input: {state.user_input}")
         return state
@@ -104,8 +103,8 @@ class Orchestrator:
         try:
             self.openai_agent.set_conversation_id(state.memory["conversation_id"])
             logger.debug(f"Processing with OpenAI: {state.user_input}")
-            # Added timeout for agent processing
-            response = await asyncio.wait_for(self.openai_agent.process(state.user_input), timeout=30.0)
+            # Agent calls are fully async, so hitting the timeout cancels the in-flight provider request
+            response = await asyncio.wait_for(self.openai_agent.process(state.user_input), timeout=get_settings().agent_timeout)
 
             if not response:
                 state.error = "OpenAI agent returned no response."
@@ -131,8 +130,8 @@ class Orchestrator:
         try:
             self.groq_agent.set_conversation_id(state.memory["conversation_id"])
             logger.debug(f"Processing with Groq: {state.user_input}")
-            # Added timeout for agent processing
-            response = await asyncio.wait_for(self.groq_agent.process(state.user_input), timeout=30.0)
+            # Agent calls are fully async, so hitting the timeout cancels the in-flight provider request
+            response = await asyncio.wait_for(self.groq_agent.process(state.user_input), timeout=get_settings().agent_timeout)
 
             if not response:
                 state.error = "Groq agent returned no response."
@@ -158,11 +157,13 @@ class Orchestrator:
         if state.tool_calls:
             current_time = datetime.now().isoformat()
 
-            state.memory["long_term"][current_time] = {
-                "role": "system",
-                "content": "Tool execution",
-                "tool_calls": state.tool_calls
-            }
+            state.memory["long_term"][current_time] = Message(
+                conversation_id=state.memory["conversation_id"],
+                role="system",
+                content="Tool execution",
+                timestamp=current_time,
+                tool_calls=state.tool_calls
+            )
         return state
     
     async def _format_response(self, state: AgentState) -> AgentState:
@@ -202,31 +203,28 @@ class Orchestrator:
         # Save to memory
         current_time = datetime.now().isoformat()
 
-        state.memory["history"].append({
-            "role": "assistant",
-            "content": formatted_response,
-            "timestamp": current_time
-        })
-
-        state.memory["long_term"][current_time] = {
-            "role": "assistant",
-            "content": formatted_response
-        }
+        message = Message(
+            conversation_id=state.memory["conversation_id"],
+            role="assistant",
+            content=formatted_response,
+            timestamp=current_time
+        )
+        state.memory["history"].append(message)
+        state.memory["long_term"][current_time] = message
 
         # Set the cleaned system message
         state.system_message = formatted_response
 
         return state
 
-    async def process(self, user_input: str, agent_type: AgentType = AgentType.OPENAI, conversation_id: Optional[str] = None) -> Dict[str, Any]:
+    def _initial_state(self, user_input: str, agent_type: AgentType, conversation_id: Optional[str]) -> AgentState:
         state = AgentState(agent_type=agent_type, user_input=user_input)
 
         if conversation_id:
             state.memory["conversation_id"] = conversation_id
+        return state
 
-        logger.debug(f"Starting process for input: {user_input}")
-        result = await self.graph.ainvoke(state)
-
+    def _build_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
         error = result.get("error")
         if error:
             logger.error(f"Error occurred: {error}")
@@ -236,10 +234,64 @@ class Orchestrator:
                 "conversation_id": result["memory"]["conversation_id"]
             }
 
-        response = result.get("response", {})
+        response = result.get("response") or {}
         return {
             "status": "success",
             "response": response.get("content", ""),
             "tool_results": result.get("tool_calls", []),
             "conversation_id": result["memory"]["conversation_id"]
         }
+
+    async def process(self, user_input: str, agent_type: AgentType = AgentType.OPENAI, conversation_id: Optional[str] = None) -> Dict[str, Any]:
+        state = self._initial_state(user_input, agent_type, conversation_id)
+
+        logger.debug(f"Starting process for input: {user_input}")
+        result = await self.graph.ainvoke(state)
+
+        return self._build_result(result)
+
+    async def astream(self, user_input: str, agent_type: AgentType = AgentType.OPENAI, conversation_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run the graph and yield typed events while it executes.
+
+        Chat model calls made inside the agent nodes stream automatically when
+        the graph is driven through astream_events, so tokens are forwarded as
+        the provider produces them.
+
+        Yields:
+            Dicts with a "type" of "token", "tool_call", "tool_result" or "done".
+            The "done" event carries the same payload as process().
+        """
+        state = self._initial_state(user_input, agent_type, conversation_id)
+
+        logger.debug(f"Starting stream for input: {user_input}")
+        result = None
+        async for event in self.graph.astream_events(state, version="v2"):
+            kind = event["event"]
+
+            if kind == "on_chat_model_stream":
+                content = event["data"]["chunk"].content
+                if isinstance(content, str) and content:
+                    yield {"type": "token", "content": content}
+            elif kind == "on_tool_start":
+                yield {
+                    "type": "tool_call",
+                    "tool_name": event["name"],
+                    "input": event["data"].get("input")
+                }
+            elif kind == "on_tool_end":
+                yield {
+                    "type": "tool_result",
+                    "tool_name": event["name"],
+                    "output": event["data"].get("output")
+                }
+            elif kind == "on_chain_end" and not event.get("parent_ids"):
+                # Root graph run finished, its output is the final state
+                result = event["data"]["output"]
+
+        if result is None:
+            result = {"error": "Graph produced no output.", "memory": state.memory}
+        elif isinstance(result, AgentState):
+            result = result.model_dump()
+
+        yield {"type": "done", **self._build_result(result)}
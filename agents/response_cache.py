@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+import json
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional
+from config.logger import get_logger
+from config.settings import get_settings
+
+logger = get_logger(__name__)
+
+# Set per request to send provider calls straight through, see bypass_response_cache()
+_bypass: ContextVar[bool] = ContextVar("response_cache_bypass", default=False)
+
+@contextmanager
+def bypass_response_cache(bypass: bool = True):
+    """Skip the response cache for provider calls made inside this block (and tasks started from it)."""
+    token = _bypass.set(bypass)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+def cache_key(model: str, messages: List[Any], tools: Optional[Any] = None) -> str:
+    """Hash of everything that decides a provider response: model, message types and contents, tool specs."""
+    payload = {
+        "model": model,
+        "messages": [[getattr(message, "type", type(message).__name__), message.content] for message in messages],
+        "tools": tools or [],
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+class _Entry(NamedTuple):
+    response: Any
+    # Provider latency of the call that produced response, credited on every hit
+    latency: float
+    expires_at: float
+
+class _DiskTier:
+    """sqlite-backed second tier, so cached responses survive restarts. Calls block, run them in a thread."""
+
+    PRUNE_EVERY = 500
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache (key TEXT PRIMARY KEY, entry BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[_Entry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT entry FROM response_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def put(self, key: str, entry: _Entry):
+        with self._lock:
+            self._conn.execute(
+                "REPLACE INTO response_cache (key, entry, expires_at) VALUES (?, ?, ?)",
+                (key, pickle.dumps(entry), entry.expires_at)
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class ResponseCache:
+    """
+    Exact-match cache of provider responses, shared by the agents.
+
+    A call is answered from the cache when the model, the full message list and
+    the tool specs are identical to an earlier call within ttl seconds. Entries
+    are kept in an LRU of max_entries, and in an sqlite file as well when
+    disk_path is set. Failed calls are never cached. Requests can opt out with
+    bypass_response_cache().
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None,
+                 disk_path: Optional[str] = None, enabled: Optional[bool] = None):
+        settings = get_settings()
+        self._max_entries = max_entries or settings.llm_cache_max_entries
+        self._ttl = ttl or settings.llm_cache_ttl
+        self._enabled = settings.llm_cache_enabled if enabled is None else enabled
+        disk_path = disk_path if disk_path is not None else settings.llm_cache_disk_path
+        self._disk = _DiskTier(disk_path) if disk_path and self._enabled else None
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "bypassed": 0, "evictions": 0}
+        self._latency_saved = 0.0
+
+    def _get(self, key: str) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key: str, entry: _Entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _hit(self, entry: _Entry, tier: str) -> Any:
+        with self._lock:
+            self._stats["hits"] += 1
+            self._stats[f"{tier}_hits"] += 1
+            self._latency_saved += entry.latency
+        return entry.response
+
+    async def ainvoke(self, client: Any, model: str, messages: List[Any], tools: Optional[Any] = None, **kwargs) -> Any:
+        """
+        client.ainvoke(messages, **kwargs), answered from the cache when an identical
+        call is cached. tools are the specs the client has bound, they only go into the key.
+        """
+        if not self._enabled or _bypass.get():
+            self._stats["bypassed"] += 1
+            return await client.ainvoke(messages, **kwargs)
+
+        key = cache_key(model, messages, tools)
+        entry = self._get(key)
+        if entry is not None:
+            return self._hit(entry, "memory")
+
+        if self._disk is not None:
+            entry = await asyncio.to_thread(self._disk.get, key)
+            if entry is not None:
+                self._put(key, entry)
+                return self._hit(entry, "disk")
+
+        self._stats["misses"] += 1
+        start = time.perf_counter()
+        response = await client.ainvoke(messages, **kwargs)
+        entry = _Entry(response, time.perf_counter() - start, time.time() + self._ttl)
+
+        self._put(key, entry)
+        if self._disk is not None:
+            try:
+                await asyncio.to_thread(self._disk.put, key, entry)
+            except Exception as e:
+                logger.warning(f"Could not write response to the disk cache: {e}")
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            latency_saved = self._latency_saved
+            entries = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["entries"] = entries
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["latency_saved"] = latency_saved
+        return stats
+
+    def close(self):
+        if self._disk is not None:
+            self._disk.close()
+
+@lru_cache(maxsize=None)
+def get_response_cache() -> ResponseCache:
+    """The process-wide response cache, built on first use."""
+    return ResponseCache()
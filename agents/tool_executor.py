@@ -0,0 +1,97 @@
+import asyncio
+import contextvars
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.callbacks import AsyncCallbackManager
+from langchain_core.runnables.config import ensure_config
+from tools.registry import ToolRegistry
+from agents.tool_process_pool import get_tool_process_pool
+from config.logger import get_logger
+from config.settings import get_settings
+
+logger = get_logger(__name__)
+
+# (tool name, tool, parsed arguments) for one call requested by the model
+ToolCall = Tuple[str, Any, Dict[str, Any]]
+
+@lru_cache(maxsize=None)
+def get_tool_thread_pool() -> ThreadPoolExecutor:
+    """Threads for tools without a native coroutine, shared by every executor."""
+    return ThreadPoolExecutor(max_workers=get_settings().tool_thread_pool_size, thread_name_prefix="tool")
+
+class ToolExecutor:
+    """
+    Runs the tool calls of one model response concurrently.
+
+    At most max_concurrency calls run at once across all requests sharing the
+    executor. Tools registered as isolated run in the limited process pool,
+    tools with a native coroutine are awaited on the event loop, other sync
+    tools go to the shared thread pool. Each call is bounded by its tool's
+    timeout from the registry. A call that fails or times out yields an error
+    result instead of failing the others, and results keep the call order.
+    Cancelling run_all() cancels the calls still waiting; a sync tool already
+    running in a thread is abandoned, not interrupted, while an isolated one
+    has its worker process killed.
+    """
+
+    def __init__(self, registry: ToolRegistry, max_concurrency: Optional[int] = None):
+        self._registry = registry
+        self._semaphore = asyncio.Semaphore(max_concurrency or get_settings().tool_max_concurrency)
+
+    async def _invoke_isolated(self, name: str, tool: Any, args: Dict[str, Any]) -> Any:
+        """Runs the tool in the process pool, reporting it to the LangChain callbacks as tool.ainvoke() would."""
+        config = ensure_config()
+        callback_manager = AsyncCallbackManager.configure(
+            config.get("callbacks"),
+            getattr(tool, "callbacks", None),
+            False,
+            config.get("tags"),
+            getattr(tool, "tags", None),
+            config.get("metadata"),
+            getattr(tool, "metadata", None),
+        )
+        run_manager = await callback_manager.on_tool_start(
+            {"name": name, "description": getattr(tool, "description", "")},
+            str(args),
+            name=name,
+            inputs=args
+        )
+        try:
+            result = await get_tool_process_pool().run(name, args)
+        except BaseException as e:
+            await run_manager.on_tool_error(e)
+            raise
+        await run_manager.on_tool_end(result, name=name)
+        return result
+
+    async def _invoke(self, name: str, tool: Any, args: Dict[str, Any]) -> Any:
+        if self._registry.is_isolated(name):
+            return await self._invoke_isolated(name, tool, args)
+        if getattr(tool, "coroutine", None) is not None:
+            return await tool.ainvoke(args)
+        loop = asyncio.get_running_loop()
+        # The copied context carries the LangChain run config, so the tool's callbacks
+        # (on_tool_start/on_tool_end for astream_events) fire as if it ran inline
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(get_tool_thread_pool(), context.run, tool.invoke, args)
+
+    async def run(self, name: str, tool: Any, args: Dict[str, Any]) -> Dict[str, Any]:
+        timeout = self._registry.timeout_for(name)
+        async with self._semaphore:
+            try:
+                logger.info(f"Executing tool: {name}")
+                result = await asyncio.wait_for(self._invoke(name, tool, args), timeout=timeout)
+                logger.info(f"Tool execution successful: {result}")
+                return {"tool_name": name, "input": args, "output": result}
+            except asyncio.TimeoutError:
+                logger.error(f"Tool {name} timed out after {timeout}s")
+                return {"tool_name": name, "input": args, "error": f"Tool timed out after {timeout}s"}
+            except Exception as e:
+                logger.error(f"Error executing tool: {str(e)}")
+                logger.error(traceback.format_exc())
+                return {"tool_name": name, "input": args, "error": str(e)}
+
+    async def run_all(self, calls: List[ToolCall]) -> List[Dict[str, Any]]:
+        return list(await asyncio.gather(*(self.run(name, tool, args) for name, tool, args in calls)))
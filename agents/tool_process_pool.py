@@ -0,0 +1,187 @@
+import asyncio
+import multiprocessing
+import resource
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Set, Tuple
+from config.logger import get_logger
+from config.settings import get_settings
+
+logger = get_logger(__name__)
+
+# Spawned, not forked: the API process has an event loop, client pools and threads
+_context = multiprocessing.get_context("spawn")
+
+def _cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+def _worker_main(conn, cpu_limit: int, memory_limit: int):
+    """Serves (tool name, args) requests until the pipe closes."""
+    from tools import get_tool_registry
+    registry = get_tool_registry()
+
+    # Limits go on after the imports, which need more address space than any tool call
+    if memory_limit:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    _, cpu_hard = resource.getrlimit(resource.RLIMIT_CPU)
+
+    while True:
+        try:
+            name, args = conn.recv()
+        except EOFError:
+            return
+        if cpu_limit:
+            # RLIMIT_CPU counts the whole process lifetime, so each call gets its budget on top of what was used.
+            # The kernel sends SIGXCPU past the soft limit, which terminates the worker.
+            soft = int(_cpu_seconds()) + cpu_limit + 1
+            resource.setrlimit(resource.RLIMIT_CPU, (soft if cpu_hard == resource.RLIM_INFINITY else min(soft, cpu_hard), cpu_hard))
+        try:
+            tool = registry.get(name)
+            if tool is None:
+                raise LookupError(f"Tool '{name}' not found in tool registry")
+            conn.send((True, tool.invoke(args)))
+        except Exception as e:
+            conn.send((False, f"{type(e).__name__}: {e}"))
+
+class _Worker:
+    def __init__(self, cpu_limit: int, memory_limit: int):
+        self._conn, child_conn = _context.Pipe()
+        self.process = _context.Process(
+            target=_worker_main, args=(child_conn, cpu_limit, memory_limit), daemon=True, name="tool-worker"
+        )
+        self.process.start()
+        child_conn.close()
+
+    def call(self, name: str, args: Dict[str, Any]) -> Tuple[bool, Any]:
+        """Blocking round trip, raises EOFError or OSError when the worker dies or is killed meanwhile."""
+        self._conn.send((name, args))
+        return self._conn.recv()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self._conn.close()
+
+class ToolProcessPool:
+    """
+    Warm worker processes for tools registered as isolated.
+
+    Each call runs in one worker process with a CPU-time limit per call and an
+    address-space limit, so runaway input (9**9**9**9 for the calculator) costs
+    a worker instead of the API process. Workers are reused across calls. A
+    worker that times out, is cancelled or hits a limit is killed and replaced.
+    """
+
+    def __init__(self, size: Optional[int] = None, cpu_limit: Optional[int] = None,
+                 memory_limit_mb: Optional[int] = None):
+        settings = get_settings()
+        self._size = size or settings.tool_process_pool_size
+        self._cpu_limit = cpu_limit if cpu_limit is not None else settings.tool_process_cpu_limit
+        memory_limit_mb = memory_limit_mb if memory_limit_mb is not None else settings.tool_process_memory_limit_mb
+        self._memory_limit = memory_limit_mb * 1024 * 1024
+        self._idle: List[_Worker] = [self._spawn() for _ in range(self._size)]
+        self._busy: Set[_Worker] = set()
+        self._available = asyncio.Semaphore(self._size)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._cpu_limit, self._memory_limit)
+
+    def _acquire(self) -> Optional[_Worker]:
+        """An idle worker marked busy, None when the slot's replacement failed to start."""
+        with self._lock:
+            if not self._idle:
+                return None
+            worker = self._idle.pop()
+            self._busy.add(worker)
+            return worker
+
+    def _release(self, worker: _Worker):
+        with self._lock:
+            self._busy.discard(worker)
+            if not self._closed:
+                self._idle.append(worker)
+                return
+        worker.kill()
+
+    def _discard(self, worker: _Worker):
+        with self._lock:
+            self._busy.discard(worker)
+        worker.kill()
+
+    async def _start(self, name: str) -> _Worker:
+        """A worker for a slot left empty, the permit goes back when none can start."""
+        try:
+            worker = await asyncio.get_running_loop().run_in_executor(None, self._spawn)
+        except BaseException as e:
+            self._available.release()
+            if isinstance(e, Exception):
+                raise RuntimeError(f"No tool worker could be started for {name}: {e}") from e
+            raise
+        with self._lock:
+            self._busy.add(worker)
+        return worker
+
+    def _respawn(self):
+        """
+        Starts a replacement worker off the loop, its slot frees up once the
+        worker is idle. When it fails to start the slot frees up empty, and the
+        next call retries the start.
+        """
+        def started(future):
+            if future.exception() is not None:
+                logger.error(f"Could not start a tool worker: {future.exception()}")
+                self._available.release()
+                return
+            worker = future.result()
+            if self._closed:
+                worker.kill()
+                return
+            self._release(worker)
+            self._available.release()
+        asyncio.get_running_loop().run_in_executor(None, self._spawn).add_done_callback(started)
+
+    async def run(self, name: str, args: Dict[str, Any]) -> Any:
+        """
+        Result of the named tool run in a worker. Bound it with asyncio.wait_for():
+        a call that is cancelled or times out kills its worker.
+        """
+        if self._closed:
+            raise RuntimeError("Tool process pool is closed")
+        await self._available.acquire()
+        worker = self._acquire() or await self._start(name)
+        try:
+            # A plain thread, not the tool pool: the call only waits on the pipe
+            ok, result = await asyncio.get_running_loop().run_in_executor(None, worker.call, name, args)
+        except BaseException as e:
+            # Cancelled while the worker may still be busy, or the worker died on a limit
+            self._discard(worker)
+            if self._closed:
+                raise RuntimeError("Tool process pool is closed") from None
+            self._respawn()
+            if isinstance(e, (EOFError, OSError)):
+                logger.warning(f"Tool worker for {name} exited with code {worker.process.exitcode}")
+                raise RuntimeError(f"Tool {name} exceeded its CPU or memory limit") from None
+            logger.warning(f"Killed tool worker for {name}")
+            raise
+        self._release(worker)
+        self._available.release()
+        if not ok:
+            raise RuntimeError(result)
+        return result
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            workers, self._idle = self._idle + list(self._busy), []
+            self._busy = set()
+        for worker in workers:
+            worker.kill()
+
+@lru_cache(maxsize=None)
+def get_tool_process_pool() -> ToolProcessPool:
+    """The process-wide pool for isolated tools, workers start on first call."""
+    return ToolProcessPool()
@@ -1,11 +1,13 @@
+import asyncio
 from fastapi import FastAPI
 from api.routes import router
-from config.logger import Logging
-from config.settings import MONGODB_URI, MONGODB_LOG_DB, MONGODB_LOG_COLLECTION
+from config.logger import get_logger, get_logging
+from config.database import close_mongo_clients, close_async_mongo_clients
+from config.settings import get_settings
+from agents.response_cache import get_response_cache
+from agents.tool_process_pool import get_tool_process_pool
 
-# Configure LOGGING
-logger_obj = Logging(MONGODB_URI, MONGODB_LOG_DB, MONGODB_LOG_COLLECTION)
-logger = logger_obj.setup_logger()
+logger = get_logger(__name__)
 # Create FastApi app
 app = FastAPI(
     title= "Multi-Agent LLM System",
@@ -17,28 +19,48 @@ app.include_router(router,prefix="/api")
 
 @app.on_event("startup")
 async def startup_event():
+    get_logging()
     from agents.openai_agent import OpenAIAgent
     from agents.groq_agent import GroqAgent
     from agents.orchestrator import Orchestrator
     from memory.short_term.cache_memory import CacheMemory
-    from memory.long_term.mongodb_memory import MongoDBMemory
-    from memory.long_term.mysql_memory import MySQLMemory
-    from tools import get_all_tools
+    from memory.long_term.async_mongodb_memory import AsyncMongoDBMemory
+    from memory.long_term.async_mysql_memory import AsyncMySQLMemory
+    from memory.long_term.mongodb_conversation_memory import MongoDBConversationMemory
+    from memory.long_term.mysql_conversation_memory import MySQLConversationMemory
+    from memory.write_behind_memory import WriteBehindMemory
+    from memory.tiered_memory import TieredMemory
+    from tools import get_tool_registry
 
-    tools = get_all_tools()
+    tools = get_tool_registry()
+    if tools.isolated:
+        # Workers are spawned up front so the first isolated tool call does not pay for it
+        await asyncio.to_thread(get_tool_process_pool)
 
-    short_term_memory = CacheMemory()
-    mongodb_memory = MongoDBMemory()
-    mysql_memory = MySQLMemory()
+    cache_memory = CacheMemory()
+    if get_settings().long_term_layout == "conversation":
+        # One bucketed document/row per conversation, constructors connect so keep them off the loop
+        mongodb_backend, mysql_backend = await asyncio.gather(
+            asyncio.to_thread(MongoDBConversationMemory),
+            asyncio.to_thread(MySQLConversationMemory)
+        )
+    else:
+        mongodb_backend, mysql_backend = AsyncMongoDBMemory(), AsyncMySQLMemory()
 
+    # Long-term writes are persisted off the response path
+    mongodb_memory = WriteBehindMemory(mongodb_backend)
+    mysql_memory = WriteBehindMemory(mysql_backend)
+    await asyncio.gather(mongodb_memory.initialize(), mysql_memory.initialize())
+
+    # Both agents share the cache, each reads through to its own long-term store
     openaiagent = OpenAIAgent(
-        short_term_memory=short_term_memory,
+        short_term_memory=TieredMemory(cache_memory, mongodb_memory),
         long_term_memory=mongodb_memory,
         tools=tools
     )
 
     groqagent = GroqAgent(
-        short_term_memory=short_term_memory,
+        short_term_memory=TieredMemory(cache_memory, mysql_memory),
         long_term_memory=mysql_memory,
         tools=tools
     )
@@ -48,10 +70,19 @@ async def startup_event():
     app.state.orchestrator = orchestrator
     app.state.openai_agent = openaiagent
     app.state.groq_agent = groqagent
+    app.state.long_term_memories = [mongodb_memory, mysql_memory]
 
     logger.info("Agents Initialized")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down")
-    logger_obj.close()
\ No newline at end of file
+    # Drains queued long-term writes before the clients go away
+    for memory in app.state.long_term_memories:
+        await memory.close()
+    await close_async_mongo_clients()
+    get_response_cache().close()
+    if get_tool_process_pool.cache_info().currsize:
+        get_tool_process_pool().close()
+    get_logging().close()
+    close_mongo_clients()
\ No newline at end of file
@@ -1,9 +1,12 @@
+import json
 from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Dict, Any, List, Optional
 from enum import Enum
 
 from agents.orchestrator import AgentType
+from agents.response_cache import bypass_response_cache, get_response_cache
 
 router = APIRouter()
 
@@ -12,6 +15,7 @@ class ChatRequest(BaseModel):
     message: str = Field(..., description="User message")
     agent_type: AgentType = Field(default=AgentType.OPENAI, description="Agent type to use")
     conversation_id: Optional[str] = Field(default=None, description="Conversation ID for continuing a conversation")
+    no_cache: bool = Field(default=False, description="Always call the provider instead of reusing a cached response")
 
 class ChatResponse(BaseModel):
     """Response model for chat endpoint."""
@@ -39,11 +43,12 @@ async def chat(request: ChatRequest, orchestrator=Depends(lambda: get_orchestrat
         ChatResponse: The processed response
     """
     try:
-        result = await orchestrator.process(
-            user_input = request.message,
-            agent_type = request.agent_type,
-            conversation_id = request.conversation_id
-        )
+        with bypass_response_cache(request.no_cache):
+            result = await orchestrator.process(
+                user_input = request.message,
+                agent_type = request.agent_type,
+                conversation_id = request.conversation_id
+            )
 
         return ChatResponse(
             status=result.get("status", "error"),
@@ -55,6 +60,42 @@ async def chat(request: ChatRequest, orchestrator=Depends(lambda: get_orchestrat
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest, orchestrator=Depends(lambda: get_orchestrator())):
+    """
+    Process a chat message and stream the answer as Server-Sent Events.
+
+    Each SSE message is named after its event type ("token", "tool_call",
+    "tool_result", "done" or "error") and carries a JSON payload. The final
+    "done" event has the same fields as ChatResponse, including conversation_id.
+    A response served from the LLM response cache produces no "token" events.
+    
+    Args:
+        request: Chat request containing message and agent preferences
+        orchestrator: Dependency-injected orchestrator instance
+        
+    Returns:
+        StreamingResponse: text/event-stream of chat events
+    """
+    async def event_stream():
+        try:
+            with bypass_response_cache(request.no_cache):
+                async for event in orchestrator.astream(
+                    user_input = request.message,
+                    agent_type = request.agent_type,
+                    conversation_id = request.conversation_id
+                ):
+                    yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        except Exception as e:
+            payload = {"type": "error", "error": str(e), "conversation_id": request.conversation_id}
+            yield f"event: error\ndata: {json.dumps(payload)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/conversations/{conversation_id}", response_model=Dict[str, Any])
 async def get_conversation(
     conversation_id: str, 
@@ -87,23 +128,42 @@ async def get_conversation(
             raise HTTPException(status_code=400, detail="Invalid agent type")
             
         agent.set_conversation_id(conversation_id)
-        history = agent.retrieve_memory(
+        # Newest first, already merged and truncated to limit
+        history = await agent.retrieve_memory(
             {"conversation_id": conversation_id},
-            use_long_term=True
+            use_long_term=True,
+            limit=limit
         )
         
-        # Sort by timestamp and limit
-        history.sort(key=lambda x: x.get("timestamp", 0), reverse=True)
-        history = history[:limit]
-        
         return {
             "conversation_id": conversation_id,
-            "messages": history
+            "messages": [dict(message) for message in history]
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/stats", response_model=Dict[str, Any])
+async def get_stats(orchestrator=Depends(lambda: get_orchestrator())):
+    """
+    Get runtime counters for the memory, logging and LLM response cache layers.
+    
+    Returns:
+        Dict of component name to its counters
+    """
+    from config.logger import get_logging
+
+    stats = {
+        "short_term_memory": orchestrator.openai_agent.short_term_memory.stats(),
+        "logging": get_logging().stats(),
+        "llm_response_cache": get_response_cache().stats()
+    }
+    for agent_type, agent in ((AgentType.OPENAI, orchestrator.openai_agent), (AgentType.GROQ, orchestrator.groq_agent)):
+        if hasattr(agent.long_term_memory, "stats"):
+            stats[f"{agent_type.value}_long_term_memory"] = agent.long_term_memory.stats()
+    return stats
+
+
 @router.get("/agents", response_model=List[str])
 async def get_available_agents():
     """
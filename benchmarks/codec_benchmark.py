@@ -0,0 +1,73 @@
+"""
+Stored size and encode/decode time of memory messages per codec.
+
+    python -m benchmarks.codec_benchmark [--number N]
+
+"json.dumps" is the whole-dict JSON the backends stored before codecs existed.
+Sizes count everything written per message: the clear fields as JSON plus the
+encoded payload.
+"""
+import argparse
+import json
+import time
+import timeit
+from memory.codec import CODECS_BY_NAME, MessageCodec, PAYLOAD_FIELD
+
+SENTENCE = "The orchestrator routes each request to the agent whose memory backend fits the conversation best. "
+
+SAMPLES = {
+    "user turn": {
+        "conversation_id": "4f1c2a9e-8d7b-4c3a-9f21-6b0e5d7a1c33",
+        "role": "user",
+        "content": "What is 12 * 7 + 3, and can you convert the answer to uppercase words?",
+        "timestamp": time.time(),
+    },
+    "assistant reply": {
+        "conversation_id": "4f1c2a9e-8d7b-4c3a-9f21-6b0e5d7a1c33",
+        "role": "assistant",
+        "content": SENTENCE * 30,
+        "timestamp": time.time(),
+    },
+    "tool output": {
+        "conversation_id": "4f1c2a9e-8d7b-4c3a-9f21-6b0e5d7a1c33",
+        "role": "assistant",
+        "content": SENTENCE * 5,
+        "tool_results": [
+            {"tool": "text_converter", "args": {"text": SENTENCE * 10, "mode": "upper"}, "result": SENTENCE.upper() * 10}
+            for _ in range(4)
+        ],
+        "timestamp": time.time(),
+    },
+}
+
+def stored_size(document):
+    payload = document.get(PAYLOAD_FIELD, b"")
+    clear = {field: value for field, value in document.items() if field != PAYLOAD_FIELD}
+    return len(json.dumps(clear).encode()) + len(payload)
+
+def variants():
+    yield "json.dumps", lambda data: json.dumps(data).encode(), lambda blob: json.loads(blob), len
+    for name, codec in CODECS_BY_NAME.items():
+        for threshold, label in ((0, name), (1024, f"{name}+zlib")):
+            message_codec = MessageCodec(codec, compress_threshold=threshold)
+            yield label, message_codec.pack, MessageCodec.unpack, stored_size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000, help="iterations per measurement")
+    args = parser.parse_args()
+
+    print(f"{'sample':<16} {'codec':<14} {'bytes':>7} {'ratio':>6} {'encode us':>10} {'decode us':>10}")
+    for sample_name, data in SAMPLES.items():
+        baseline = None
+        for label, encode, decode, size_of in variants():
+            stored = encode(data)
+            assert decode(stored) == data
+            size = size_of(stored)
+            baseline = baseline or size
+            encode_us = timeit.timeit(lambda: encode(data), number=args.number) / args.number * 1e6
+            decode_us = timeit.timeit(lambda: decode(stored), number=args.number) / args.number * 1e6
+            print(f"{sample_name:<16} {label:<14} {size:>7} {size / baseline:>6.2f} {encode_us:>10.1f} {decode_us:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import threading
+from typing import Dict
+from pymongo import AsyncMongoClient, MongoClient
+from config.settings import get_settings
+
+_clients: Dict[str, MongoClient] = {}
+_async_clients: Dict[str, AsyncMongoClient] = {}
+_clients_lock = threading.Lock()
+
+def get_mongo_client(uri: str) -> MongoClient:
+    """Return the process-wide pooled client for uri, creating it on first use."""
+    client = _clients.get(uri)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(uri)
+            if client is None:
+                settings = get_settings()
+                client = MongoClient(
+                    uri,
+                    maxPoolSize=settings.mongodb_max_pool_size,
+                    maxIdleTimeMS=settings.mongodb_max_idle_time_ms
+                )
+                _clients[uri] = client
+    return client
+
+def get_async_mongo_client(uri: str) -> AsyncMongoClient:
+    """Return the process-wide asyncio client for uri. Must be first called from the event loop it will serve."""
+    client = _async_clients.get(uri)
+    if client is None:
+        with _clients_lock:
+            client = _async_clients.get(uri)
+            if client is None:
+                settings = get_settings()
+                client = AsyncMongoClient(
+                    uri,
+                    maxPoolSize=settings.mongodb_max_pool_size,
+                    maxIdleTimeMS=settings.mongodb_max_idle_time_ms
+                )
+                _async_clients[uri] = client
+    return client
+
+async def close_async_mongo_clients():
+    with _clients_lock:
+        clients = list(_async_clients.values())
+        _async_clients.clear()
+    for client in clients:
+        await client.close()
+
+def close_mongo_clients():
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
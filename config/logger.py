@@ -1,11 +1,24 @@
+import queue
+import threading
+import time
+from typing import Optional
 from loguru import logger
-from pymongo import MongoClient
-import json
-from config.settings import IP_V4
+from config.database import get_mongo_client
+from config.settings import get_settings
 
 class Logging:
-    def __init__(self, MONGODB_URI, MONGODB_LOG_DB, MONGODB_LOG_COLLECTION):
-        self._client = MongoClient(MONGODB_URI)
+    def __init__(self, MONGODB_URI, MONGODB_LOG_DB, MONGODB_LOG_COLLECTION,
+                 batch_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None,
+                 queue_size: Optional[int] = None,
+                 overflow_policy: Optional[str] = None):
+        settings = get_settings()
+        batch_size = batch_size or settings.log_batch_size
+        flush_interval = flush_interval or settings.log_flush_interval
+        queue_size = queue_size or settings.log_queue_size
+        overflow_policy = overflow_policy or settings.log_overflow_policy
+
+        self._client = get_mongo_client(MONGODB_URI)
         self._db = self._client[MONGODB_LOG_DB]
         self._collection = self._db[MONGODB_LOG_COLLECTION]
 
@@ -16,38 +29,138 @@ class Logging:
             logger.info("Connected to MongoDB successfuly")
         except Exception as e:
             logger.error(f"MongoDB connection error: {e}")
+
+        # Log records are handed to a background thread and written with insert_many,
+        # so the logging call itself only pays for a queue put.
+        if overflow_policy not in ("drop_newest", "drop_oldest"):
+            raise ValueError(f"Unknown log overflow policy: {overflow_policy}")
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._overflow_policy = overflow_policy
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._overflow_lock = threading.Lock()
+        self._stats = {"dropped": 0, "shipped": 0, "failed": 0, "batches": 0}
+        self._closed = threading.Event()
+        self._shipper = threading.Thread(target=self._ship_loop, name="mongo-log-shipper", daemon=True)
+        self._shipper.start()
     
     def setup_logger(self):
         logger.remove()
         logger.add(lambda msg: print(msg), level="INFO")
-        logger.add(self.log_to_db, level="DEBUG", serialize=True)
+        logger.add(self.log_to_db, level="DEBUG", format="{message}")
         
         return logger
     
-    def log_to_db(self, record):
+    def log_to_db(self, message):
+        if self._closed.is_set():
+            self._count_drop()
+            return
+
+        record = message.record
+        entry = (
+            record["time"],
+            record["level"].name,
+            record["message"],
+            record["file"].name,
+            record["function"],
+            record["line"],
+            dict(record["extra"])
+        )
+
         try:
-            if isinstance(record, str):
-                record = json.loads(record)
-            
-            log_data = record.get("record", {})
-            
-            log_entry = {
-                "timestamp": log_data.get("time", {}).get("repr"),
-                "host": IP_V4,
-                "level": log_data.get("level", {}).get("name"),
-                "message": log_data.get("message"),
-                "file": log_data.get("file", {}).get("name"),
-                "function": log_data.get("function"),
-                "line": log_data.get("line"),
-                "context": log_data.get("extra", {})
-            }
-            
-            log_entry = {k: v for k, v in log_entry.items() if v is not None}
-            
-            self._collection.insert_one(log_entry)
-        except Exception as e:
-            print(f"Error writing log to MongoDB: {e}")
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            if self._overflow_policy == "drop_oldest":
+                try:
+                    self._queue.get_nowait()
+                    self._queue.put_nowait(entry)
+                except (queue.Empty, queue.Full):
+                    pass
+            self._count_drop()
+
+    def _count_drop(self):
+        with self._overflow_lock:
+            self._stats["dropped"] += 1
+
+    @staticmethod
+    def _to_document(entry):
+        log_time, level, message, file, function, line, extra = entry
+        log_entry = {
+            "timestamp": str(log_time),
+            "host": get_settings().ip_v4,
+            "level": level,
+            "message": message,
+            "file": file,
+            "function": function,
+            "line": line,
+            "context": {k: v if isinstance(v, (str, int, float, bool)) else str(v) for k, v in extra.items()}
+        }
+
+        return {k: v for k, v in log_entry.items() if v is not None}
+
+    def _next_batch(self):
+        """Collect up to batch_size entries, waiting at most flush_interval after the first one."""
+        try:
+            batch = [self._queue.get(timeout=self._flush_interval)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self._flush_interval
+        while len(batch) < self._batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if self._closed.is_set() or remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _ship_loop(self):
+        while not (self._closed.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                self._collection.insert_many([self._to_document(e) for e in batch], ordered=False)
+                self._stats["shipped"] += len(batch)
+                self._stats["batches"] += 1
+            except Exception as e:
+                self._stats["failed"] += len(batch)
+                print(f"Error writing logs to MongoDB: {e}")
+
+    def stats(self):
+        """Return shipper counters plus the current queue depth."""
+        return {**self._stats, "queued": self._queue.qsize()}
     
     def close(self):
-        if self._client:
-            self._client.close()
\ No newline at end of file
+        # Stop accepting records and drain whatever is queued. The Mongo client is
+        # shared, it is closed by config.database.close_mongo_clients on shutdown.
+        self._closed.set()
+        self._shipper.join(timeout=max(self._flush_interval * 2, 5.0))
+
+
+_runtime: Optional[Logging] = None
+_runtime_lock = threading.Lock()
+
+def get_logging() -> Logging:
+    """Return the process-wide Logging runtime, registering the sinks on first call."""
+    global _runtime
+    if _runtime is None:
+        with _runtime_lock:
+            if _runtime is None:
+                settings = get_settings()
+                runtime = Logging(settings.mongodb_uri, settings.mongodb_log_db, settings.mongodb_log_collection)
+                runtime.setup_logger()
+                _runtime = runtime
+    return _runtime
+
+def get_logger(name: str):
+    """
+    Return a child logger tagged with the calling module's name.
+
+    This is safe to call at import time, the sinks and the Mongo connection are
+    only set up once an entry point calls get_logging().
+    """
+    return logger.bind(module=name)
@@ -1,47 +1,184 @@
 import os
-from dotenv import load_dotenv
 import socket
-
-load_dotenv()
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from typing import Optional
+from dotenv import load_dotenv
 
 def get_ipv4():
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     try:
         s.connect(("8.8.8.8", 80))
         return s.getsockname()[0]
+    except OSError:
+        return "127.0.0.1"
     finally:
         s.close()
 
 #PATH
 CONFIG_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# KEYS
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+@dataclass(frozen=True)
+class Settings:
+    # KEYS
+    openai_api_key: Optional[str]
+    groq_api_key: Optional[str]
+
+    # DAtABASE
+    mongodb_uri: str
+    mongodb_db: str
+    mongodb_log_db: str
+    mongodb_collection: str
+    mongodb_log_collection: str
+    mongodb_max_pool_size: int
+    mongodb_max_idle_time_ms: int
+
+    mysql_host: str
+    mysql_user: str
+    mysql_password: str
+    mysql_db: str
+    mysql_port: int
+    mysql_pool_size: int
+    mysql_pool_timeout: float
+    mysql_pool_ping_interval: float
+    mysql_statement_cache_size: int
+    mysql_pool_recycle: int
+
+    #Logging
+    log_batch_size: int
+    log_flush_interval: float
+    log_queue_size: int
+    log_overflow_policy: str
+
+    #Short term memory
+    short_term_memory_expiration: int
+    cache_max_size: int
+    cache_max_bytes: int
+    cache_shards: int
+    cache_codec: str
+
+    #Long term memory write-behind
+    write_behind_batch_size: int
+    write_behind_flush_interval: float
+    write_behind_queue_size: int
+    write_behind_max_retries: int
+    tiered_warmup_limit: int
+    long_term_layout: str
+    conversation_bucket_size: int
+    memory_codec: str
+    memory_compress_threshold: int
+    memory_compression_level: int
+
+    #Agents
+    agent_timeout: float
+    context_token_budget: int
+    context_response_reserve: int
+    tool_timeout: float
+    tool_max_concurrency: int
+    tool_thread_pool_size: int
+    tool_process_pool_size: int
+    tool_process_cpu_limit: int
+    tool_process_memory_limit_mb: int
+
+    #LLM response cache
+    llm_cache_enabled: bool
+    llm_cache_max_entries: int
+    llm_cache_ttl: float
+    llm_cache_disk_path: str
+
+    #API CONFIG
+    api_host: str
+    api_port: int
+
+    #Streamlit
+    streamlit_port: int
+
+    #IP, detected on first use unless set explicitly
+    host_ip: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            openai_api_key=os.getenv("OPENAI_API_KEY"),
+            groq_api_key=os.getenv("GROQ_API_KEY"),
+
+            mongodb_uri=os.getenv("MONGODB_URI", "mongodb://localhost:27017/"),
+            mongodb_db=os.getenv("MONGODB_DB", "agent_memory"),
+            mongodb_log_db=os.getenv("MONGODB_LOG_DB","loggingdb"),
+            mongodb_collection=os.getenv("MONGODB_COLLECTION", "conversations"),
+            mongodb_log_collection=os.getenv("MONGODB_LOG_COLLECTION","multiagentlog"),
+            mongodb_max_pool_size=int(os.getenv("MONGODB_MAX_POOL_SIZE", "50")),
+            mongodb_max_idle_time_ms=int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "60000")),
+
+            mysql_host=os.getenv("MYSQL_HOST", "localhost"),
+            mysql_user=os.getenv("MYSQL_USER", "root"),
+            mysql_password=os.getenv("MYSQL_PASSWORD", "admin@123"),
+            mysql_db=os.getenv("MYSQL_DB", "agent_memory"),
+            mysql_port=int(os.getenv("MYSQL_PORT", "3306")),
+            mysql_pool_size=int(os.getenv("MYSQL_POOL_SIZE", "10")),
+            mysql_pool_timeout=float(os.getenv("MYSQL_POOL_TIMEOUT", "5")),
+            mysql_pool_ping_interval=float(os.getenv("MYSQL_POOL_PING_INTERVAL", "30")),
+            mysql_statement_cache_size=int(os.getenv("MYSQL_STATEMENT_CACHE_SIZE", "32")),
+            mysql_pool_recycle=int(os.getenv("MYSQL_POOL_RECYCLE", "1800")),
+
+            log_batch_size=int(os.getenv("LOG_BATCH_SIZE", "200")),
+            log_flush_interval=float(os.getenv("LOG_FLUSH_INTERVAL", "1.0")),
+            log_queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+            log_overflow_policy=os.getenv("LOG_OVERFLOW_POLICY", "drop_newest"),
+
+            short_term_memory_expiration=int(os.getenv("SHORT_TERM_MEMORY_EXPIRATION","3600")),
+            cache_max_size=int(os.getenv("CACHE_MAX_SIZE","1000")),
+            cache_max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+            cache_shards=int(os.getenv("CACHE_SHARDS", "16")),
+            cache_codec=os.getenv("CACHE_CODEC", "plain"),
+
+            write_behind_batch_size=int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "100")),
+            write_behind_flush_interval=float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "0.5")),
+            write_behind_queue_size=int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", "10000")),
+            write_behind_max_retries=int(os.getenv("WRITE_BEHIND_MAX_RETRIES", "5")),
+            tiered_warmup_limit=int(os.getenv("TIERED_WARMUP_LIMIT", "200")),
+            long_term_layout=os.getenv("LONG_TERM_LAYOUT", "message"),
+            conversation_bucket_size=int(os.getenv("CONVERSATION_BUCKET_SIZE", "200")),
+            memory_codec=os.getenv("MEMORY_CODEC", "json"),
+            memory_compress_threshold=int(os.getenv("MEMORY_COMPRESS_THRESHOLD", "1024")),
+            memory_compression_level=int(os.getenv("MEMORY_COMPRESSION_LEVEL", "6")),
+
+            agent_timeout=float(os.getenv("AGENT_TIMEOUT", "30")),
+            context_token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "16000")),
+            context_response_reserve=int(os.getenv("CONTEXT_RESPONSE_RESERVE", "1024")),
+            tool_timeout=float(os.getenv("TOOL_TIMEOUT", "10")),
+            tool_max_concurrency=int(os.getenv("TOOL_MAX_CONCURRENCY", "8")),
+            tool_thread_pool_size=int(os.getenv("TOOL_THREAD_POOL_SIZE", "8")),
+            tool_process_pool_size=int(os.getenv("TOOL_PROCESS_POOL_SIZE", "2")),
+            tool_process_cpu_limit=int(os.getenv("TOOL_PROCESS_CPU_LIMIT", "5")),
+            tool_process_memory_limit_mb=int(os.getenv("TOOL_PROCESS_MEMORY_LIMIT_MB", "1024")),
+
+            llm_cache_enabled=os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes"),
+            llm_cache_max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000")),
+            llm_cache_ttl=float(os.getenv("LLM_CACHE_TTL", "300")),
+            llm_cache_disk_path=os.getenv("LLM_CACHE_DISK_PATH", ""),
 
-# DAtABASE
-MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
-MONGODB_DB = os.getenv("MONGODB_DB", "agent_memory")
-MONGODB_LOG_DB = os.getenv("MONGODB_LOG_DB","loggingdb")
-MONGODB_COLLECTION = os.getenv("MONGODB_COLLECTION", "conversations")
-MONGODB_LOG_COLLECTION = os.getenv("MONGODB_LOG_COLLECTION","multiagentlog")
+            api_host=os.getenv("API_HOST","0.0.0.0"),
+            api_port=int(os.getenv("API_PORT", "8000")),
 
-MYSQL_HOST = os.getenv("MYSQL_HOST", "localhost")
-MYSQL_USER = os.getenv("MYSQL_USER", "root")
-MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD", "admin@123")
-MYSQL_DB = os.getenv("MYSQL_DB", "agent_memory")
-MYSQL_PORT = int(os.getenv("MYSQL_PORT", "3306"))
+            streamlit_port=int(os.getenv("STREAMLIT_PORT", "8501")),
 
-#Short term memory
-SHORT_TERM_MEMORY_EXPIRATION = int(os.getenv("SHORT_TERM_MEMORY_EXPIRATION","3600"))
-CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE","1000"))
+            host_ip=os.getenv("HOST_IP"),
+        )
 
-#API CONFIG
-API_HOST = os.getenv("API_HOST","0.0.0.0")
-API_PORT = int(os.getenv("API_PORT", "8000"))
+    @cached_property
+    def ip_v4(self) -> str:
+        return self.host_ip or get_ipv4()
 
-#Streamlit
-STREAMLIT_PORT = int(os.getenv("STREAMLIT_PORT", "8501"))
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Load .env and build the settings on first call, later calls reuse them."""
+    load_dotenv()
+    return Settings.from_env()
 
-#IP
-IP_V4 = get_ipv4()
\ No newline at end of file
+def __getattr__(name):
+    # Keeps `from config.settings import MONGODB_URI` style imports working
+    attr = name.lower()
+    if attr in Settings.__dataclass_fields__ or attr == "ip_v4":
+        return getattr(get_settings(), attr)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
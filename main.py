@@ -6,26 +6,25 @@ import threading
 import os
 import time
 from api.main import app as api_app
-from config.logger import Logging
-from config.settings import API_HOST, API_PORT, STREAMLIT_PORT, MONGODB_URI, MONGODB_LOG_DB, MONGODB_LOG_COLLECTION, CONFIG_DIR
+from config.logger import get_logger, get_logging
+from config.settings import get_settings
 
-# Configure logging
-logger_obj = Logging(MONGODB_URI, MONGODB_LOG_DB, MONGODB_LOG_COLLECTION)
-logger = logger_obj.setup_logger()
+logger = get_logger(__name__)
 
 def start_streamlit():
     """Start the Streamlit UI in a subprocess."""
     try:
         streamlit_file = os.path.join(os.path.dirname(__file__), "ui", "streamlit_app.py")
+        streamlit_port = get_settings().streamlit_port
         
         process = subprocess.Popen(
-            ["streamlit", "run", streamlit_file, "--server.port", str(STREAMLIT_PORT)],
+            ["streamlit", "run", streamlit_file, "--server.port", str(streamlit_port)],
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             text=True
         )
         
-        logger.info(f"Started Streamlit UI on port {STREAMLIT_PORT}")
+        logger.info(f"Started Streamlit UI on port {streamlit_port}")
         
         # Log Streamlit output
         for line in process.stdout:
@@ -41,10 +40,11 @@ def start_streamlit():
 def start_api():
     """Start the FastAPI server."""
     try:
+        settings = get_settings()
         uvicorn.run(
             "api.main:app",
-            host=API_HOST,
-            port=API_PORT,
+            host=settings.api_host,
+            port=settings.api_port,
             reload=False,
             log_level="info"
         )
@@ -58,7 +58,8 @@ def main():
     parser.add_argument("--no-ui", action="store_true", help="Start without the Streamlit UI")
     parser.add_argument("--api-only", action="store_true", help="Start only the API server")
     args = parser.parse_args()
-    
+
+    get_logging()
     logger.info("Starting Multi-Agent LLM System")
     
     if args.api_only:
@@ -0,0 +1,53 @@
+import asyncio
+from abc import ABC,abstractmethod
+from typing import Dict,List,Any,Optional
+from memory.memory_interface import MemoryPage
+
+class AsyncMemoryInterface(ABC):
+    """Async counterpart of MemoryInterface, for backends with non-blocking drivers"""
+
+    async def initialize(self):
+        """Open connections and prepare storage. Called once from the running event loop."""
+        pass
+
+    async def close(self):
+        pass
+
+    @abstractmethod
+    async def save(self, key : str, data : Dict[str,Any]) -> bool:
+        pass
+    
+    @abstractmethod
+    async def load(self, key : str) -> Optional[Dict[str,Any]]:
+        pass
+
+    @abstractmethod
+    async def delete(self, key : str) -> bool:
+        pass
+
+    @abstractmethod
+    async def search(self, query : Dict[str,Any], limit : Optional[int] = None, descending : bool = False) -> List[Dict[str,Any]]:
+        pass
+
+    @abstractmethod
+    async def save_many(self, items : Dict[str,Dict[str,Any]]) -> bool:
+        pass
+
+    @abstractmethod
+    async def load_many(self, keys : List[str]) -> Dict[str,Dict[str,Any]]:
+        pass
+
+    @abstractmethod
+    async def query_range(self, conversation_id : str, since : Optional[float] = None, until : Optional[float] = None,
+                          limit : Optional[int] = None, descending : bool = False, cursor : Optional[str] = None) -> MemoryPage:
+        pass
+
+
+async def call_memory(memory, method : str, *args, **kwargs):
+    """Call a memory method without blocking the event loop, whichever kind of backend it is."""
+    func = getattr(memory, method)
+    if isinstance(memory, AsyncMemoryInterface):
+        return await func(*args, **kwargs)
+    if memory.blocking:
+        return await asyncio.to_thread(func, *args, **kwargs)
+    return func(*args, **kwargs)
@@ -0,0 +1,187 @@
+import base64
+import json
+import zlib
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Dict, Any, Iterable, Optional, Tuple, Union
+from config.settings import get_settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Header of an encoded payload: format version, codec id, flags
+FORMAT_VERSION = 1
+FLAG_ZLIB = 0x01
+
+# Field holding the encoded payload in a stored document
+PAYLOAD_FIELD = "_payload"
+
+# Fields backends filter, sort or index on, kept readable next to the payload
+CLEAR_FIELDS = ("conversation_id", "role", "timestamp")
+
+class Codec(ABC):
+    """Serializes a message dict to bytes. codec_id is written into every payload, never reuse one."""
+
+    codec_id: int
+    name: str
+
+    @abstractmethod
+    def dumps(self, data : Dict[str,Any]) -> bytes:
+        pass
+
+    @abstractmethod
+    def loads(self, blob : bytes) -> Dict[str,Any]:
+        pass
+
+class JSONCodec(Codec):
+    codec_id = 1
+    name = "json"
+
+    def dumps(self, data):
+        if orjson is not None:
+            return orjson.dumps(data)
+        return json.dumps(data, separators=(",", ":")).encode()
+
+    def loads(self, blob):
+        if orjson is not None:
+            return orjson.loads(blob)
+        return json.loads(blob)
+
+class MsgpackCodec(Codec):
+    codec_id = 2
+    name = "msgpack"
+
+    def dumps(self, data):
+        return msgpack.packb(data, use_bin_type=True)
+
+    def loads(self, blob):
+        return msgpack.unpackb(blob, raw=False)
+
+# Codecs this process can decode, by id and by name
+CODECS: Dict[int, Codec] = {JSONCodec.codec_id: JSONCodec()}
+if msgpack is not None:
+    CODECS[MsgpackCodec.codec_id] = MsgpackCodec()
+CODECS_BY_NAME = {codec.name: codec for codec in CODECS.values()}
+
+class MessageCodec:
+    """
+    Turns messages into stored documents and back.
+
+    pack() keeps CLEAR_FIELDS as they are and encodes every other field into
+    PAYLOAD_FIELD, compressed with zlib once it is larger than compress_threshold.
+    Backends can still query the clear fields, the rest is only readable after
+    unpack(). The payload header records the codec and compression, so payloads
+    written with another codec, and documents stored before codecs existed,
+    still unpack. With codec None, pack() stores messages unchanged.
+    """
+
+    def __init__(self, codec : Optional[Codec], compress_threshold : int = 1024, compression_level : int = 6,
+                 clear_fields : Iterable[str] = CLEAR_FIELDS):
+        self.codec = codec
+        self.compress_threshold = compress_threshold
+        self.compression_level = compression_level
+        self.clear_fields = frozenset(clear_fields)
+
+    @property
+    def name(self) -> str:
+        return self.codec.name if self.codec is not None else "plain"
+
+    def with_clear_fields(self, fields : Iterable[str]) -> "MessageCodec":
+        """Same codec, also keeping fields in the clear (e.g. the ones a backend indexes)."""
+        return MessageCodec(self.codec, self.compress_threshold, self.compression_level, self.clear_fields | set(fields))
+
+    def encode(self, data : Dict[str,Any]) -> bytes:
+        body = self.codec.dumps(data)
+        flags = 0
+        if self.compress_threshold and len(body) > self.compress_threshold:
+            compressed = zlib.compress(body, self.compression_level)
+            if len(compressed) < len(body):
+                body, flags = compressed, FLAG_ZLIB
+        return bytes((FORMAT_VERSION, self.codec.codec_id, flags)) + body
+
+    @staticmethod
+    def decode(blob : Union[bytes, str]) -> Dict[str,Any]:
+        if isinstance(blob, str):
+            blob = base64.b64decode(blob)
+        version, codec_id, flags = blob[0], blob[1], blob[2]
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported payload format version {version}")
+        codec = CODECS.get(codec_id)
+        if codec is None:
+            raise ValueError(f"Payload codec {codec_id} is not available")
+        body = bytes(blob[3:])
+        if flags & FLAG_ZLIB:
+            body = zlib.decompress(body)
+        return codec.loads(body)
+
+    def pack(self, data : Dict[str,Any], text : bool = False) -> Dict[str,Any]:
+        """Stored form of data. With text=True the payload is base64, for stores that only hold JSON."""
+        if self.codec is None:
+            return data
+        document = {}
+        rest = {}
+        for field, value in data.items():
+            if field in self.clear_fields:
+                document[field] = value
+            else:
+                rest[field] = value
+        if rest:
+            payload = self.encode(rest)
+            document[PAYLOAD_FIELD] = base64.b64encode(payload).decode() if text else payload
+        return document
+
+    def split_query(self, query : Dict[str,Any]) -> Tuple[Dict[str,Any], Dict[str,Any]]:
+        """
+        (stored, encoded) parts of a search query. Backends match the stored part,
+        the encoded fields are only readable after unpack() and are matched with
+        matches_query() on the decoded messages. Raises ValueError for queries on
+        encoded fields that cannot be matched that way (operators, dotted paths).
+        """
+        if self.codec is None:
+            return dict(query), {}
+        stored = {}
+        encoded = {}
+        for field, value in query.items():
+            if field.startswith("$"):
+                raise ValueError(f"Query operator {field!r} is not supported with the {self.name} memory codec")
+            if field.split(".", 1)[0] in self.clear_fields:
+                stored[field] = value
+            elif "." in field or (isinstance(value, dict) and any(str(op).startswith("$") for op in value)):
+                raise ValueError(
+                    f"Field {field!r} is encoded by the {self.name} memory codec, only whole-field equality can be searched"
+                )
+            else:
+                encoded[field] = value
+        return stored, encoded
+
+    @classmethod
+    def unpack(cls, document : Dict[str,Any]) -> Dict[str,Any]:
+        if PAYLOAD_FIELD not in document:
+            return document
+        data = dict(document)
+        data.update(cls.decode(data.pop(PAYLOAD_FIELD)))
+        return data
+
+def matches_query(data : Dict[str,Any], query : Dict[str,Any]) -> bool:
+    """Whether a decoded message equals query on every field, for the encoded part of split_query()."""
+    return all(field in data and data[field] == value for field, value in query.items())
+
+@lru_cache(maxsize=None)
+def get_message_codec(name : Optional[str] = None) -> MessageCodec:
+    """MessageCodec for the configured MEMORY_CODEC, or for name ("plain", "json", "msgpack")."""
+    settings = get_settings()
+    name = name or settings.memory_codec
+    if name == "plain":
+        codec = None
+    elif name in CODECS_BY_NAME:
+        codec = CODECS_BY_NAME[name]
+    else:
+        raise ValueError(f"Unknown or unavailable memory codec {name!r}")
+    return MessageCodec(codec, settings.memory_compress_threshold, settings.memory_compression_level)
@@ -0,0 +1,100 @@
+from typing import Dict, List, Any, Optional, Iterable, Union
+from pymongo import ASCENDING, DESCENDING, ReplaceOne
+from memory.async_memory_interface import AsyncMemoryInterface
+from memory.memory_interface import MemoryPage
+from memory.long_term.mongodb_memory import build_projection, build_range_query, page_from_documents, from_document
+from memory.codec import MessageCodec, get_message_codec, matches_query
+from config.database import get_async_mongo_client
+from config.settings import get_settings
+
+class AsyncMongoDBMemory(AsyncMemoryInterface):
+    """MongoDBMemory on pymongo's asyncio client, same collection layout and indexes."""
+
+    def __init__(self, codec : Optional[MessageCodec] = None):
+        self._codec = codec or get_message_codec()
+        self._collection = None
+
+    async def initialize(self):
+        settings = get_settings()
+        client = get_async_mongo_client(settings.mongodb_uri)
+        self._collection = client[settings.mongodb_db][settings.mongodb_collection]
+
+        await self._collection.create_index([("conversation_id", ASCENDING), ("timestamp", ASCENDING)])
+
+    async def save(self, key : str, data : Dict[str,Any]) -> bool:
+        try:
+            await self._collection.replace_one({"_id": key}, {"_id": key, **self._codec.pack(data)}, upsert=True)
+            return True
+        except Exception:
+            return False
+
+    async def load(self, key : str) -> Optional[Dict[str,Any]]:
+        try:
+            document = await self._collection.find_one({"_id": key}, {"_id": 0})
+            return from_document(document) if document else None
+        except Exception:
+            return None
+
+    async def delete(self, key : str) -> bool:
+        try:
+            result = await self._collection.delete_one({"_id": key})
+            return result.deleted_count > 0
+        except Exception:
+            return False
+
+    async def search(self, query : Dict[str,Any], limit : Optional[int] = None, descending : bool = False,
+                     projection : Optional[Union[Dict[str,Any], Iterable[str]]] = None) -> List[Dict[str,Any]]:
+        # Encoded fields are only in the payload, they are matched after decoding and the limit with them
+        stored, encoded = self._codec.split_query(query)
+        try:
+            cursor = self._collection.find(stored, build_projection(projection)).sort(
+                "timestamp", DESCENDING if descending else ASCENDING
+            )
+            if limit is not None and not encoded:
+                cursor = cursor.limit(limit)
+
+            results = []
+            async for doc in cursor:
+                if encoded:
+                    doc = from_document(doc)
+                    if not matches_query(doc, encoded):
+                        continue
+                results.append(from_document(doc, projection))
+                if encoded and limit is not None and len(results) >= limit:
+                    break
+            return results
+        except Exception:
+            return []
+
+    async def save_many(self, items : Dict[str,Dict[str,Any]]) -> bool:
+        if not items:
+            return True
+        try:
+            requests = [
+                ReplaceOne({"_id": key}, {"_id": key, **self._codec.pack(data)}, upsert=True)
+                for key, data in items.items()
+            ]
+            await self._collection.bulk_write(requests, ordered=False)
+            return True
+        except Exception:
+            return False
+
+    async def load_many(self, keys : List[str]) -> Dict[str,Dict[str,Any]]:
+        try:
+            results = {}
+            async for document in self._collection.find({"_id": {"$in": list(keys)}}):
+                results[document["_id"]] = from_document(document)
+            return results
+        except Exception:
+            return {}
+
+    async def query_range(self, conversation_id : str, since : Optional[float] = None, until : Optional[float] = None,
+                          limit : Optional[int] = None, descending : bool = False, cursor : Optional[str] = None) -> MemoryPage:
+        query, sort = build_range_query(conversation_id, since, until, descending, cursor)
+        try:
+            documents = self._collection.find(query).sort(sort)
+            if limit is not None:
+                documents = documents.limit(limit)
+            return page_from_documents([document async for document in documents], limit)
+        except Exception:
+            return MemoryPage([], None)
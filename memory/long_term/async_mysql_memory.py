@@ -0,0 +1,116 @@
+from typing import Dict, Any, List, Optional
+import aiomysql
+from memory.async_memory_interface import AsyncMemoryInterface
+from memory.memory_interface import MemoryPage
+from memory.long_term.mysql_memory import (
+    EXISTING_COLUMNS_SQL, EXISTING_INDEXES_SQL, create_table_sql, migration_statements,
+    INDEXED_COLUMNS, build_search_sql, build_range_sql, filter_rows, page_from_rows, bulk_replace_statements, bulk_select_statements,
+    message_to_row, row_to_message
+)
+from memory.codec import MessageCodec, get_message_codec
+from config.settings import get_settings
+
+class AsyncMySQLMemory(AsyncMemoryInterface):
+    """MySQLMemory on an aiomysql pool, same table, generated columns and queries."""
+
+    def __init__(self, pool_size: Optional[int] = None, codec: Optional[MessageCodec] = None):
+        self._pool_size = pool_size
+        self._codec = (codec or get_message_codec()).with_clear_fields(INDEXED_COLUMNS)
+        self._pool = None
+
+    async def initialize(self):
+        settings = get_settings()
+        self._pool = await aiomysql.create_pool(
+            host = settings.mysql_host,
+            user = settings.mysql_user,
+            password = settings.mysql_password,
+            db = settings.mysql_db,
+            port = settings.mysql_port,
+            minsize = 1,
+            maxsize = self._pool_size or settings.mysql_pool_size,
+            # Recycled well before the server's wait_timeout so checkouts never get a dead socket
+            pool_recycle = settings.mysql_pool_recycle,
+            autocommit = True
+        )
+
+        async with self._pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(create_table_sql())
+                await cursor.execute(EXISTING_COLUMNS_SQL)
+                existing_columns = {row[0] for row in await cursor.fetchall()}
+                await cursor.execute(EXISTING_INDEXES_SQL)
+                existing_indexes = {row[0] for row in await cursor.fetchall()}
+                for statement in migration_statements(existing_columns, existing_indexes):
+                    await cursor.execute(statement)
+
+    async def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+
+    async def _execute(self, sql: str, params: tuple = (), fetch: bool = False):
+        async with self._pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(sql, params)
+                if fetch:
+                    return await cursor.fetchall()
+                return cursor.rowcount
+
+    async def save(self, key, data):
+        try:
+            await self._execute("REPLACE INTO memory (id, data, payload) VALUES (%s, %s, %s)", (key, *message_to_row(self._codec, data)))
+            return True
+        except Exception:
+            return False
+
+    async def load(self, key):
+        try:
+            rows = await self._execute("SELECT data, payload FROM memory WHERE id = %s", (key,), fetch=True)
+            if rows:
+                return row_to_message(*rows[0])
+            return None
+        except Exception:
+            return None
+
+    async def delete(self, key):
+        try:
+            return await self._execute("DELETE FROM memory WHERE id = %s", (key,)) > 0
+        except Exception:
+            return False
+
+    async def search(self, query, limit : Optional[int] = None, descending : bool = False):
+        # Encoded fields are not in the data column, they are matched after decoding and the limit with them
+        stored, encoded = self._codec.split_query(query)
+        try:
+            sql, params = build_search_sql(stored, None if encoded else limit, descending)
+            rows = await self._execute(sql, params, fetch=True)
+            return filter_rows(rows, encoded, limit)
+        except Exception:
+            return []
+
+    async def save_many(self, items : Dict[str,Dict[str,Any]]) -> bool:
+        try:
+            for sql, params in bulk_replace_statements(items, self._codec):
+                await self._execute(sql, params)
+            return True
+        except Exception:
+            return False
+
+    async def load_many(self, keys : List[str]) -> Dict[str,Dict[str,Any]]:
+        try:
+            results = {}
+            for sql, params in bulk_select_statements(keys):
+                for key, data, payload in await self._execute(sql, params, fetch=True):
+                    results[key] = row_to_message(data, payload)
+            return results
+        except Exception:
+            return {}
+
+    async def query_range(self, conversation_id : str, since : Optional[float] = None, until : Optional[float] = None,
+                          limit : Optional[int] = None, descending : bool = False, cursor : Optional[str] = None) -> MemoryPage:
+        sql, params = build_range_sql(conversation_id, since, until, limit, descending, cursor)
+        try:
+            rows = await self._execute(sql, params, fetch=True)
+        except Exception:
+            return MemoryPage([], None)
+        return page_from_rows(rows, limit)
@@ -0,0 +1,133 @@
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Any, List, Optional, Iterable, Iterator, Tuple
+from memory.memory_interface import MemoryPage, encode_cursor, decode_cursor
+
+# Field holding the memory key inside each stored message
+KEY_FIELD = "_key"
+
+# A bucket as read back from storage: (first_ts, last_ts, decoded messages, possibly read lazily)
+Bucket = Tuple[float, float, Iterable[Dict[str,Any]]]
+
+def conversation_of(key : str) -> str:
+    """Conversation id of a key built by memory_key()."""
+    return key.rsplit(":", 1)[0]
+
+def to_entry(key : str, data : Dict[str,Any]) -> Dict[str,Any]:
+    return {KEY_FIELD: key, **data}
+
+def from_entry(entry : Dict[str,Any]) -> Tuple[str, Dict[str,Any]]:
+    data = dict(entry)
+    return data.pop(KEY_FIELD), data
+
+def group_by_conversation(items : Dict[str,Dict[str,Any]], bucket_size : int) -> List[Tuple[str, List[Dict[str,Any]]]]:
+    """
+    Split items into (conversation_id, entries) appends, ordered by timestamp
+    and no larger than bucket_size, so each one fits into a single bucket.
+    """
+    grouped: Dict[str, List[Dict[str,Any]]] = {}
+    for key, data in items.items():
+        grouped.setdefault(data.get("conversation_id") or conversation_of(key), []).append(to_entry(key, data))
+
+    appends = []
+    for conversation_id, entries in grouped.items():
+        entries.sort(key=lambda entry: entry.get("timestamp", 0))
+        for start in range(0, len(entries), bucket_size):
+            appends.append((conversation_id, entries[start:start + bucket_size]))
+    return appends
+
+def timestamp_bounds(entries : List[Dict[str,Any]]) -> Tuple[float, float]:
+    timestamps = [entry.get("timestamp", 0) for entry in entries]
+    return min(timestamps), max(timestamps)
+
+def _matches(data : Dict[str,Any], query : Dict[str,Any]) -> bool:
+    return all(data.get(field) == value for field, value in query.items())
+
+def _ordered(found : Dict[str,Dict[str,Any]], descending : bool) -> List[Tuple[str, Dict[str,Any]]]:
+    return sorted(found.items(), key=lambda item: (item[1].get("timestamp", 0), item[0]), reverse=descending)
+
+def collect_messages(buckets : Iterable[Bucket], query : Dict[str,Any], limit : Optional[int] = None,
+                     descending : bool = False,
+                     accept : Optional[Callable[[str, Dict[str,Any]], bool]] = None) -> List[Tuple[str, Dict[str,Any]]]:
+    """
+    Flatten buckets into (key, data) pairs matching query, ordered by timestamp.
+
+    Buckets must arrive newest last_ts first when descending, oldest first_ts
+    first otherwise, and their entries are only read for buckets that can still
+    contribute. With a limit, reading stops at the first bucket that cannot.
+    accept further filters entries by key and data. A key stored twice keeps
+    its most recent copy.
+    """
+    latest: Dict[str, Dict[str,Any]] = {}
+    # (timestamp, key) of the best limit matches so far, ascending. Replaced
+    # copies are dropped from it, so it can only undercount and stop later.
+    best: List[Tuple[Any, str]] = []
+
+    def counted(key, data):
+        return _matches(data, query) and (accept is None or accept(key, data))
+
+    for first_ts, last_ts, entries in buckets:
+        if limit is not None and len(best) >= limit:
+            boundary = best[0][0] if descending else best[-1][0]
+            if (last_ts < boundary) if descending else (first_ts > boundary):
+                break
+
+        # Within a bucket later entries are newer, across buckets the first seen is
+        # the newest when descending and the last seen is the newest otherwise
+        local = dict(from_entry(entry) for entry in entries)
+        for key, data in local.items():
+            previous = latest.get(key)
+            if previous is not None:
+                if descending:
+                    continue
+                position = bisect_left(best, (previous.get("timestamp", 0), key))
+                if position < len(best) and best[position] == (previous.get("timestamp", 0), key):
+                    best.pop(position)
+            latest[key] = data
+
+            if limit is not None and counted(key, data):
+                insort(best, (data.get("timestamp", 0), key))
+                if len(best) > limit:
+                    best.pop(0 if descending else -1)
+
+    ordered = _ordered({key: data for key, data in latest.items() if counted(key, data)}, descending)
+    return ordered[:limit] if limit is not None else ordered
+
+def _overlapping(buckets : Iterable[Bucket], low : Optional[float], high : Optional[float]) -> Iterator[Bucket]:
+    """Buckets that can hold a timestamp in [low, high], the others are skipped without reading their entries."""
+    for bucket in buckets:
+        first_ts, last_ts, _ = bucket
+        if (low is not None and last_ts < low) or (high is not None and first_ts > high):
+            continue
+        yield bucket
+
+def page_messages(buckets : Iterable[Bucket], since : Optional[float], until : Optional[float],
+                  limit : Optional[int], descending : bool, cursor : Optional[str]) -> MemoryPage:
+    """query_range over one conversation's buckets, with the same (timestamp, key) cursor as the per-message layout."""
+    after = tuple(decode_cursor(cursor)) if cursor else None
+
+    def in_range(key, data):
+        timestamp = data.get("timestamp", 0)
+        if since is not None and timestamp < since:
+            return False
+        if until is not None and timestamp >= until:
+            return False
+        if after is not None:
+            position = (timestamp, key)
+            return position < after if descending else position > after
+        return True
+
+    # Buckets entirely past the cursor or outside [since, until) are never decoded
+    low, high = since, until
+    if after is not None:
+        if descending:
+            high = after[0] if high is None else min(high, after[0])
+        else:
+            low = after[0] if low is None else max(low, after[0])
+
+    selected = collect_messages(_overlapping(buckets, low, high), {}, limit, descending, accept=in_range)
+
+    items = [data for _, data in selected]
+    if limit is not None and selected and len(selected) >= limit:
+        last_key, last_data = selected[-1]
+        return MemoryPage(items, encode_cursor(last_data.get("timestamp"), last_key))
+    return MemoryPage(items, None)
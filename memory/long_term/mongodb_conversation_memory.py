@@ -0,0 +1,133 @@
+from typing import Dict, List, Any, Optional, Iterator
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from memory.memory_interface import MemoryInterface, MemoryPage
+from memory.codec import MessageCodec, get_message_codec
+from memory.long_term.conversation_buckets import (
+    Bucket, KEY_FIELD, conversation_of, group_by_conversation, timestamp_bounds,
+    collect_messages, page_messages
+)
+from config.database import get_mongo_client
+from config.settings import get_settings
+
+def append_update(conversation_id : str, entries : List[Dict[str,Any]], bucket_size : int) -> UpdateOne:
+    """
+    Push entries onto the conversation's open bucket, or start a new bucket
+    when none has room for all of them.
+    """
+    first_ts, last_ts = timestamp_bounds(entries)
+    return UpdateOne(
+        {"conversation_id": conversation_id, "count": {"$lte": bucket_size - len(entries)}},
+        {
+            "$push": {"messages": {"$each": entries}},
+            "$inc": {"count": len(entries)},
+            "$min": {"first_ts": first_ts},
+            "$max": {"last_ts": last_ts}
+        },
+        upsert=True
+    )
+
+class MongoDBConversationMemory(MemoryInterface):
+    """
+    Long-term memory keeping a conversation's messages together.
+
+    Each document is a bucket of up to bucket_size messages of one
+    conversation, in an append-only array. Saving a message is a single $push
+    into the open bucket and reading a history reads that conversation's
+    buckets only. Keys are the usual memory_key() strings, and saving an
+    existing key again appends a newer copy that reads return in its place.
+    """
+
+    def __init__(self, bucket_size : Optional[int] = None, codec : Optional[MessageCodec] = None):
+        settings = get_settings()
+        self._bucket_size = bucket_size or settings.conversation_bucket_size
+        self._codec = (codec or get_message_codec()).with_clear_fields([KEY_FIELD])
+        self._client = get_mongo_client(settings.mongodb_uri)
+        self._db = self._client[settings.mongodb_db]
+        self._collection = self._db[f"{settings.mongodb_collection}_buckets"]
+
+        # Open-bucket lookup on append, time-ordered bucket scans on read, key lookups on load
+        self._collection.create_index([("conversation_id", ASCENDING), ("count", ASCENDING)])
+        self._collection.create_index([("conversation_id", ASCENDING), ("last_ts", DESCENDING)])
+        self._collection.create_index([("conversation_id", ASCENDING), ("first_ts", ASCENDING)])
+        self._collection.create_index([("conversation_id", ASCENDING), (f"messages.{KEY_FIELD}", ASCENDING)])
+
+    def _buckets(self, query : Dict[str,Any], descending : bool = False) -> Iterator[Bucket]:
+        sort = ("last_ts", DESCENDING) if descending else ("first_ts", ASCENDING)
+        cursor = self._collection.find(query, {"_id": 0, "first_ts": 1, "last_ts": 1, "messages": 1}).sort([sort])
+        for document in cursor:
+            # Decoded as collect_messages reads them, buckets it stops before are never unpacked
+            messages = (MessageCodec.unpack(entry) for entry in document.get("messages", []))
+            yield document.get("first_ts", 0), document.get("last_ts", 0), messages
+
+    def save(self, key : str, data : Dict[str,Any]) -> bool:
+        return self.save_many({key: data})
+
+    def save_many(self, items : Dict[str,Dict[str,Any]]) -> bool:
+        if not items:
+            return True
+        try:
+            requests = [
+                append_update(conversation_id, [self._codec.pack(entry) for entry in entries], self._bucket_size)
+                for conversation_id, entries in group_by_conversation(items, self._bucket_size)
+            ]
+            # Ordered, so appends to the same conversation see each other's buckets
+            self._collection.bulk_write(requests, ordered=True)
+            return True
+        except Exception:
+            return False
+
+    def load(self, key : str) -> Optional[Dict[str,Any]]:
+        return self.load_many([key]).get(key)
+
+    def load_many(self, keys : List[str]) -> Dict[str,Dict[str,Any]]:
+        try:
+            keys = list(keys)
+            query = {
+                "conversation_id": {"$in": list({conversation_of(key) for key in keys})},
+                f"messages.{KEY_FIELD}": {"$in": keys}
+            }
+            wanted = set(keys)
+            return {
+                key: data for key, data in collect_messages(self._buckets(query), {})
+                if key in wanted
+            }
+        except Exception:
+            return {}
+
+    def delete(self, key : str) -> bool:
+        try:
+            result = self._collection.update_many(
+                {"conversation_id": conversation_of(key), f"messages.{KEY_FIELD}": key},
+                [
+                    {"$set": {"messages": {"$filter": {
+                        "input": "$messages", "cond": {"$ne": [f"$$this.{KEY_FIELD}", key]}
+                    }}}},
+                    {"$set": {"count": {"$size": "$messages"}}}
+                ]
+            )
+            return result.modified_count > 0
+        except Exception:
+            return False
+
+    def search(self, query : Dict[str,Any], limit : Optional[int] = None, descending : bool = False) -> List[Dict[str,Any]]:
+        # Other clear fields only prune buckets, the exact match runs per decoded message
+        bucket_query = {
+            field if field == "conversation_id" else f"messages.{field}": value
+            for field, value in query.items() if field in self._codec.clear_fields
+        }
+        try:
+            return [data for _, data in collect_messages(self._buckets(bucket_query, descending), query, limit, descending)]
+        except Exception:
+            return []
+
+    def query_range(self, conversation_id : str, since : Optional[float] = None, until : Optional[float] = None,
+                    limit : Optional[int] = None, descending : bool = False, cursor : Optional[str] = None) -> MemoryPage:
+        query: Dict[str, Any] = {"conversation_id": conversation_id}
+        if since is not None:
+            query["last_ts"] = {"$gte": since}
+        if until is not None:
+            query["first_ts"] = {"$lt": until}
+        try:
+            return page_messages(self._buckets(query, descending), since, until, limit, descending, cursor)
+        except Exception:
+            return MemoryPage([], None)
@@ -1,20 +1,100 @@
-from typing import Dict, List, Any, Optional
-from pymongo import MongoClient
-from memory.memory_interface import MemoryInterface
-from config.settings import MONGODB_URI, MONGODB_DB, MONGODB_COLLECTION
+from typing import Dict, List, Any, Optional, Iterator, Iterable, Tuple, Union
+from pymongo import ASCENDING, DESCENDING, ReplaceOne
+from memory.memory_interface import MemoryInterface, MemoryPage, encode_cursor, decode_cursor
+from memory.codec import MessageCodec, PAYLOAD_FIELD, get_message_codec, matches_query
+from config.database import get_mongo_client
+from config.settings import get_settings
+
+def _projection_fields(projection : Union[Dict[str,Any], Iterable[str]]) -> Dict[str,Any]:
+    return projection if isinstance(projection, dict) else {field: 1 for field in projection}
+
+def build_projection(projection : Optional[Union[Dict[str,Any], Iterable[str]]]) -> Dict[str,Any]:
+    if projection is None:
+        return {"_id": 0}
+    fields = _projection_fields(projection)
+    if any(value for field, value in fields.items() if field != "_id"):
+        # Encoded fields only come back inside the payload
+        fields = {**fields, PAYLOAD_FIELD: 1}
+    return {**fields, "_id": 0}
+
+def from_document(document : Dict[str,Any], projection : Optional[Union[Dict[str,Any], Iterable[str]]] = None) -> Dict[str,Any]:
+    """Message from a stored document: payload decoded, _id and fields outside projection dropped."""
+    document.pop("_id", None)
+    data = MessageCodec.unpack(document)
+    if projection is None:
+        return data
+    fields = _projection_fields(projection)
+    included = {field for field, value in fields.items() if value and field != "_id"}
+    if included:
+        return {field: data[field] for field in included if field in data}
+    return {field: value for field, value in data.items() if field not in fields}
+
+def filter_documents(documents : Iterable[Dict[str,Any]], encoded : Dict[str,Any], limit : Optional[int],
+                     projection : Optional[Union[Dict[str,Any], Iterable[str]]] = None) -> Iterator[Dict[str,Any]]:
+    """Messages from stored documents, matched on the encoded part of the query before projecting, up to limit."""
+    if not encoded:
+        for document in documents:
+            yield from_document(document, projection)
+        return
+    count = 0
+    for document in documents:
+        if limit is not None and count >= limit:
+            return
+        data = from_document(document)
+        if matches_query(data, encoded):
+            count += 1
+            yield from_document(data, projection)
+
+def build_range_query(conversation_id : str, since : Optional[float], until : Optional[float],
+                      descending : bool, cursor : Optional[str]) -> Tuple[Dict[str,Any], List[Tuple[str,int]]]:
+    """Filter and sort spec for query_range, shared by the sync and async Mongo backends."""
+    query: Dict[str, Any] = {"conversation_id": conversation_id}
+    timestamp_range = {}
+    if since is not None:
+        timestamp_range["$gte"] = since
+    if until is not None:
+        timestamp_range["$lt"] = until
+    if timestamp_range:
+        query["timestamp"] = timestamp_range
+
+    if cursor:
+        # Keyset pagination on (timestamp, _id), continuing past the last entry read
+        last_timestamp, last_key = decode_cursor(cursor)
+        beyond = "$lt" if descending else "$gt"
+        query["$or"] = [
+            {"timestamp": {beyond: last_timestamp}},
+            {"timestamp": last_timestamp, "_id": {beyond: last_key}}
+        ]
+
+    direction = DESCENDING if descending else ASCENDING
+    return query, [("timestamp", direction), ("_id", direction)]
+
+def page_from_documents(documents : List[Dict[str,Any]], limit : Optional[int]) -> MemoryPage:
+    items = []
+    last = None
+    for document in documents:
+        key = document.pop("_id")
+        last = (document.get("timestamp"), key)
+        items.append(from_document(document))
+
+    more = limit is not None and len(items) >= limit
+    return MemoryPage(items, encode_cursor(*last) if more and last else None)
 
 class MongoDBMemory(MemoryInterface):
 
-    def __init__(self):
-        self._client = MongoClient(MONGODB_URI)
-        self._db = self._client[MONGODB_DB]
-        self._collection = self._db[MONGODB_COLLECTION]
+    def __init__(self, codec : Optional[MessageCodec] = None):
+        settings = get_settings()
+        self._codec = codec or get_message_codec()
+        self._client = get_mongo_client(settings.mongodb_uri)
+        self._db = self._client[settings.mongodb_db]
+        self._collection = self._db[settings.mongodb_collection]
 
-        self._collection.create_index("_id")
+        # _id is always indexed by Mongo, history reads filter on conversation and sort by time
+        self._collection.create_index([("conversation_id", ASCENDING), ("timestamp", ASCENDING)])
 
     def save(self, key : str, data : Dict[str,Any]) -> bool:
         try:
-            document = {"_id": key,**data}
+            document = {"_id": key,**self._codec.pack(data)}
 
             self._collection.replace_one({"_id":key},document,upsert=True)
             return True
@@ -25,8 +105,7 @@ class MongoDBMemory(MemoryInterface):
         try:
             document = self._collection.find_one({"_id":key})
             if document:
-                document.pop("_id", None)
-                return document
+                return from_document(document)
             return None
         except Exception:
             return None
@@ -38,14 +117,64 @@ class MongoDBMemory(MemoryInterface):
         except Exception:
             return False
         
-    def search(self, query : Dict[str,Any]) -> List[Dict[str,Any]]:
+    def iter_search(self, query : Dict[str,Any], limit : Optional[int] = None, descending : bool = False,
+                    projection : Optional[Union[Dict[str,Any], Iterable[str]]] = None,
+                    batch_size : int = 100) -> Iterator[Dict[str,Any]]:
+        """
+        Stream documents matching query without loading them all at once.
+
+        Sort, limit and projection run on the server, so a limited read of a
+        conversation only transfers the requested documents and fields. Fields
+        the codec encodes are fetched within the payload and trimmed after decoding.
+        A query on encoded fields matches them after decoding, and limits there.
+        """
+        stored, encoded = self._codec.split_query(query)
+        cursor = self._collection.find(stored, build_projection(projection)).sort(
+            "timestamp", DESCENDING if descending else ASCENDING
+        ).batch_size(batch_size)
+        if limit is not None and not encoded:
+            cursor = cursor.limit(limit)
+
+        yield from filter_documents(cursor, encoded, limit, projection)
+        
+    def search(self, query : Dict[str,Any], limit : Optional[int] = None, descending : bool = False,
+               projection : Optional[Union[Dict[str,Any], Iterable[str]]] = None) -> List[Dict[str,Any]]:
+        # Checked before the try, a query the codec cannot serve must not look like an empty result
+        self._codec.split_query(query)
         try:
-            cursor = self._collection.find(query)
-            results = []
-            
-            for doc in cursor:
-                doc.pop("_id",None)
-                results.append(doc)
+            return list(self.iter_search(query, limit=limit, descending=descending, projection=projection))
+        except Exception:
+            return []
+
+    def save_many(self, items : Dict[str,Dict[str,Any]]) -> bool:
+        if not items:
+            return True
+        try:
+            requests = [
+                ReplaceOne({"_id": key}, {"_id": key, **self._codec.pack(data)}, upsert=True)
+                for key, data in items.items()
+            ]
+            self._collection.bulk_write(requests, ordered=False)
+            return True
+        except Exception:
+            return False
+
+    def load_many(self, keys : List[str]) -> Dict[str,Dict[str,Any]]:
+        try:
+            results = {}
+            for document in self._collection.find({"_id": {"$in": list(keys)}}):
+                results[document["_id"]] = from_document(document)
             return results
         except Exception:
-            return []
\ No newline at end of file
+            return {}
+
+    def query_range(self, conversation_id : str, since : Optional[float] = None, until : Optional[float] = None,
+                    limit : Optional[int] = None, descending : bool = False, cursor : Optional[str] = None) -> MemoryPage:
+        query, sort = build_range_query(conversation_id, since, until, descending, cursor)
+        try:
+            documents = self._collection.find(query).sort(sort)
+            if limit is not None:
+                documents = documents.limit(limit)
+            return page_from_documents(list(documents), limit)
+        except Exception:
+            return MemoryPage([], None)
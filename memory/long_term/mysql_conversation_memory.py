@@ -0,0 +1,195 @@
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+import json
+from memory.memory_interface import MemoryPage
+from memory.codec import MessageCodec
+from memory.long_term.mysql_memory import MySQLMemory
+from memory.long_term.conversation_buckets import (
+    Bucket, KEY_FIELD, conversation_of, group_by_conversation, timestamp_bounds,
+    collect_messages, page_messages
+)
+from config.settings import get_settings
+
+CREATE_BUCKETS_SQL = """
+            CREATE TABLE IF NOT EXISTS memory_conversations (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            conversation_id VARCHAR(255) NOT NULL,
+            message_count INT NOT NULL,
+            first_ts DECIMAL(20,6) NOT NULL,
+            last_ts DECIMAL(20,6) NOT NULL,
+            messages JSON NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            INDEX idx_conversation_count (conversation_id, message_count),
+            INDEX idx_conversation_first_ts (conversation_id, first_ts),
+            INDEX idx_conversation_last_ts (conversation_id, last_ts)
+        )
+    """
+
+# Appends to the newest bucket with room, a new bucket is inserted when none matches
+APPEND_SQL = (
+    "UPDATE memory_conversations SET messages = JSON_MERGE_PRESERVE(messages, CAST(%s AS JSON)), "
+    "message_count = message_count + %s, first_ts = LEAST(first_ts, %s), last_ts = GREATEST(last_ts, %s) "
+    "WHERE conversation_id = %s AND message_count <= %s ORDER BY id DESC LIMIT 1"
+)
+INSERT_BUCKET_SQL = (
+    "INSERT INTO memory_conversations (conversation_id, message_count, first_ts, last_ts, messages) "
+    "VALUES (%s, %s, %s, %s, CAST(%s AS JSON))"
+)
+
+# Removes one copy of a key per bucket, so delete repeats until nothing matches.
+# JSON_SEARCH returns the path of the key member ("$[3]._key"), cut back to the array element ("$[3]").
+DELETE_SQL = (
+    f"UPDATE memory_conversations SET messages = JSON_REMOVE(messages, SUBSTRING_INDEX("
+    f"JSON_UNQUOTE(JSON_SEARCH(messages, 'one', %s, NULL, '$[*].{KEY_FIELD}')), '.', 1)), "
+    f"message_count = message_count - 1 "
+    f"WHERE conversation_id = %s AND JSON_SEARCH(messages, 'one', %s, NULL, '$[*].{KEY_FIELD}') IS NOT NULL"
+)
+
+# Bucket rows fetched per query, so a limited read stops after the pages it needs
+BUCKET_PAGE_SIZE = 8
+
+def escape_search_pattern(value : str) -> str:
+    """JSON_SEARCH treats % and _ as wildcards, match them literally."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def build_buckets_sql(conversation_ids : Optional[List[str]], descending : bool,
+                      since : Optional[float] = None, until : Optional[float] = None,
+                      after : Optional[Tuple[Any, int]] = None, limit : Optional[int] = None) -> Tuple[str, tuple]:
+    """
+    Bucket rows in read order: newest last_ts first when descending, oldest
+    first_ts first otherwise. after is the (first_ts or last_ts, id) of the
+    last row read, to continue past it.
+    """
+    conditions = []
+    params: List[Any] = []
+    if conversation_ids is not None:
+        conditions.append(f"conversation_id IN ({', '.join(['%s'] * len(conversation_ids))})")
+        params.extend(conversation_ids)
+    if since is not None:
+        conditions.append("last_ts >= %s")
+        params.append(since)
+    if until is not None:
+        conditions.append("first_ts < %s")
+        params.append(until)
+
+    if after is not None:
+        position, bucket_id = after
+        if descending:
+            conditions.append("(last_ts < %s OR (last_ts = %s AND id < %s))")
+        else:
+            conditions.append("(first_ts > %s OR (first_ts = %s AND id > %s))")
+        params.extend([position, position, bucket_id])
+
+    where_clause = " AND ".join(conditions) if conditions else "1=1"
+    order = "last_ts DESC, id DESC" if descending else "first_ts ASC, id ASC"
+    sql = f"SELECT id, first_ts, last_ts, messages FROM memory_conversations WHERE {where_clause} ORDER BY {order}"
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(int(limit))
+    return sql, tuple(params)
+
+def decode_entries(messages : Any) -> Iterator[Dict[str,Any]]:
+    """A bucket's stored messages, parsed and decoded as they are read."""
+    for entry in json.loads(messages):
+        yield MessageCodec.unpack(entry)
+
+class MySQLConversationMemory(MySQLMemory):
+    """
+    Long-term memory keeping a conversation's messages together, one row per
+    bucket of up to bucket_size messages in an append-only JSON array.
+
+    Saving a message is a single UPDATE on the conversation's open bucket and
+    reading a history reads that conversation's rows only. Saving an existing
+    key again appends a newer copy that reads return in its place.
+    """
+
+    def __init__(self, pool_size: Optional[int] = None, pool_timeout: Optional[float] = None,
+                 bucket_size: Optional[int] = None, codec: Optional[MessageCodec] = None):
+        self._bucket_size = bucket_size or get_settings().conversation_bucket_size
+        super().__init__(pool_size=pool_size, pool_timeout=pool_timeout, codec=codec)
+        self._codec = self._codec.with_clear_fields([KEY_FIELD])
+
+    def _create_table(self):
+        with self._connection() as pooled:
+            cursor = pooled.conn.cursor()
+            cursor.execute(CREATE_BUCKETS_SQL)
+            cursor.close()
+
+    def _buckets(self, conversation_ids : Optional[List[str]], descending : bool = False,
+                 since : Optional[float] = None, until : Optional[float] = None) -> Iterator[Bucket]:
+        """
+        Buckets in read order, BUCKET_PAGE_SIZE rows per query. Entries are
+        only parsed and decoded for the buckets collect_messages reads.
+        """
+        prepared = conversation_ids is not None and len(conversation_ids) == 1
+        after = None
+        while True:
+            sql, params = build_buckets_sql(conversation_ids, descending, since, until, after, BUCKET_PAGE_SIZE)
+            rows = self._execute(sql, params, fetch=True, prepared=prepared)
+            for _, first_ts, last_ts, messages in rows:
+                yield float(first_ts), float(last_ts), decode_entries(messages)
+            if len(rows) < BUCKET_PAGE_SIZE:
+                return
+            # The exact DECIMAL from the row, so the keyset does not go through a float
+            bucket_id, first_ts, last_ts, _ = rows[-1]
+            after = (last_ts if descending else first_ts, bucket_id)
+
+    def _append(self, conversation_id : str, entries : List[Dict[str,Any]]):
+        first_ts, last_ts = timestamp_bounds(entries)
+        # The array is JSON, so payloads are stored as base64 text
+        messages = json.dumps([self._codec.pack(entry, text=True) for entry in entries])
+        updated = self._execute(
+            APPEND_SQL,
+            (messages, len(entries), first_ts, last_ts, conversation_id, self._bucket_size - len(entries))
+        )
+        if not updated:
+            self._execute(INSERT_BUCKET_SQL, (conversation_id, len(entries), first_ts, last_ts, messages))
+
+    def save(self, key, data):
+        return self.save_many({key: data})
+
+    def save_many(self, items : Dict[str,Dict[str,Any]]) -> bool:
+        try:
+            for conversation_id, entries in group_by_conversation(items, self._bucket_size):
+                self._append(conversation_id, entries)
+            return True
+        except Exception:
+            return False
+
+    def load(self, key):
+        return self.load_many([key]).get(key)
+
+    def load_many(self, keys : List[str]) -> Dict[str,Dict[str,Any]]:
+        try:
+            wanted = set(keys)
+            buckets = self._buckets(sorted({conversation_of(key) for key in wanted}))
+            return {key: data for key, data in collect_messages(buckets, {}) if key in wanted}
+        except Exception:
+            return {}
+
+    def delete(self, key):
+        try:
+            pattern = escape_search_pattern(key)
+            deleted = 0
+            while True:
+                removed = self._execute(DELETE_SQL, (pattern, conversation_of(key), pattern))
+                if not removed:
+                    return deleted > 0
+                deleted += removed
+        except Exception:
+            return False
+
+    def search(self, query, limit : Optional[int] = None, descending : bool = False):
+        try:
+            conversation_id = query.get("conversation_id")
+            buckets = self._buckets([conversation_id] if conversation_id is not None else None, descending)
+            return [data for _, data in collect_messages(buckets, query, limit, descending)]
+        except Exception:
+            return []
+
+    def query_range(self, conversation_id : str, since : Optional[float] = None, until : Optional[float] = None,
+                    limit : Optional[int] = None, descending : bool = False, cursor : Optional[str] = None) -> MemoryPage:
+        try:
+            return page_messages(self._buckets([conversation_id], descending, since, until), since, until, limit, descending, cursor)
+        except Exception:
+            return MemoryPage([], None)
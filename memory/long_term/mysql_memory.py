@@ -1,120 +1,419 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 import json
+import queue
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+from contextlib import contextmanager
 import mysql.connector
-from memory.memory_interface import MemoryInterface
-from config.settings import MYSQL_HOST, MYSQL_PASSWORD, MYSQL_DB, MYSQL_PORT, MYSQL_USER
+from memory.memory_interface import MemoryInterface, MemoryPage, encode_cursor, decode_cursor
+from memory.codec import MessageCodec, PAYLOAD_FIELD, get_message_codec, matches_query
+from config.settings import get_settings
 
-class MySQLMemory(MemoryInterface):
+# Message fields promoted to generated columns so lookups can use an index
+# instead of JSON_EXTRACT over every row. Maps field -> (column, definition).
+INDEXED_COLUMNS = {
+    "conversation_id": ("conversation_id", "VARCHAR(255) GENERATED ALWAYS AS (JSON_UNQUOTE(JSON_EXTRACT(data, '$.conversation_id'))) VIRTUAL"),
+    "role": ("role", "VARCHAR(32) GENERATED ALWAYS AS (JSON_UNQUOTE(JSON_EXTRACT(data, '$.role'))) VIRTUAL"),
+    "timestamp": ("message_ts", "DECIMAL(20,6) GENERATED ALWAYS AS (JSON_EXTRACT(data, '$.timestamp')) VIRTUAL"),
+}
+
+# Columns added after the first release, beside the generated ones
+EXTRA_COLUMNS = {
+    # Encoded message fields, data then only holds the clear ones. NULL for rows written as plain JSON.
+    "payload": "LONGBLOB NULL",
+}
+
+INDEXES = {
+    "idx_memory_conversation_ts": "(conversation_id, message_ts)",
+    "idx_memory_conversation_role": "(conversation_id, role)",
+}
+
+# Rows per multi-row statement in save_many / keys per IN list in load_many
+BULK_CHUNK_SIZE = 500
+
+# Errors that mean the connection itself is unusable and should be replaced
+CONNECTION_ERRORS = (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError)
+
+def create_table_sql() -> str:
+    columns = ",\n".join(f"{column} {definition}" for column, definition in INDEXED_COLUMNS.values())
+    indexes = ",\n".join(f"INDEX {name} {columns_sql}" for name, columns_sql in INDEXES.items())
+    return f"""
+            CREATE TABLE IF NOT EXISTS memory (
+            id VARCHAR(255) PRIMARY KEY,
+            data JSON NOT NULL,
+            payload LONGBLOB NULL,
+            {columns},
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            {indexes}
+        )
+    """
+
+# Lookups of the columns and indexes already present, used to migrate older tables
+EXISTING_COLUMNS_SQL = "SELECT COLUMN_NAME FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'memory'"
+EXISTING_INDEXES_SQL = "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'memory'"
+
+def migration_statements(existing_columns : set, existing_indexes : set) -> List[str]:
+    # Virtual columns are not materialised, so adding them does not rebuild the table
+    statements = [
+        f"ALTER TABLE memory ADD COLUMN {column} {definition}"
+        for column, definition in [*INDEXED_COLUMNS.values(), *EXTRA_COLUMNS.items()] if column not in existing_columns
+    ]
+    statements += [
+        f"ALTER TABLE memory ADD INDEX {name} {columns_sql}"
+        for name, columns_sql in INDEXES.items() if name not in existing_indexes
+    ]
+    return statements
+
+def message_to_row(codec : MessageCodec, data : Dict[str,Any]) -> Tuple[str, Optional[bytes]]:
+    """(data, payload) column values for a message."""
+    document = codec.pack(data)
+    payload = document.pop(PAYLOAD_FIELD, None)
+    return json.dumps(document), payload
 
-    def __init__(self):
-        self._conn = mysql.connector.connect(
-            host = MYSQL_HOST,
-            user = MYSQL_USER,
-            password = MYSQL_PASSWORD,
-            database = MYSQL_DB,
-            port = MYSQL_PORT
+def row_to_message(data : str, payload : Optional[bytes]) -> Dict[str,Any]:
+    document = json.loads(data)
+    if payload is not None:
+        document[PAYLOAD_FIELD] = payload
+    return MessageCodec.unpack(document)
+
+def filter_rows(rows : Iterable[Tuple[str, Optional[bytes]]], encoded : Dict[str,Any],
+                limit : Optional[int]) -> List[Dict[str,Any]]:
+    """Decoded messages of (data, payload) rows, matched on the encoded part of the query and limited."""
+    messages = (row_to_message(data, payload) for data, payload in rows)
+    if encoded:
+        messages = (message for message in messages if matches_query(message, encoded))
+    return list(islice(messages, limit))
+
+def build_search_sql(query : Dict[str,Any], limit : Optional[int], descending : bool) -> Tuple[str, tuple]:
+    """
+    SQL for search(): fields in INDEXED_COLUMNS are matched on their indexed
+    column, anything else falls back to JSON_EXTRACT. Ordering and limit run in SQL.
+    """
+    condtitions = []
+    params = []
+
+    for key, value in query.items():
+        if key in INDEXED_COLUMNS:
+            condtitions.append(f"{INDEXED_COLUMNS[key][0]} = %s")
+            params.append(value)
+        else:
+            condtitions.append(f"JSON_EXTRACT(data, '$.{key}') = CAST(%s AS JSON)")
+            params.append(json.dumps(value))
+    
+    where_clause = " AND ".join(condtitions) if condtitions else "1=1"
+    sql = f"SELECT data, payload FROM memory WHERE {where_clause} ORDER BY message_ts {'DESC' if descending else 'ASC'}"
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(int(limit))
+    return sql, tuple(params)
+
+def build_range_sql(conversation_id : str, since : Optional[float], until : Optional[float],
+                    limit : Optional[int], descending : bool, cursor : Optional[str]) -> Tuple[str, tuple]:
+    conditions = ["conversation_id = %s"]
+    params: List[Any] = [conversation_id]
+    if since is not None:
+        conditions.append("message_ts >= %s")
+        params.append(since)
+    if until is not None:
+        conditions.append("message_ts < %s")
+        params.append(until)
+    if cursor:
+        # Keyset pagination on (message_ts, id). The cursor keeps message_ts as
+        # the exact DECIMAL text so the comparison does not go through a float.
+        last_timestamp, last_key = decode_cursor(cursor)
+        beyond = "<" if descending else ">"
+        conditions.append(
+            f"(message_ts {beyond} CAST(%s AS DECIMAL(20,6)) OR (message_ts = CAST(%s AS DECIMAL(20,6)) AND id {beyond} %s))"
         )
+        params.extend([last_timestamp, last_timestamp, last_key])
+
+    direction = "DESC" if descending else "ASC"
+    sql = f"SELECT id, data, payload, message_ts FROM memory WHERE {' AND '.join(conditions)} ORDER BY message_ts {direction}, id {direction}"
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(int(limit))
+    return sql, tuple(params)
+
+def page_from_rows(rows : List[tuple], limit : Optional[int]) -> MemoryPage:
+    """Build a MemoryPage from (id, data, payload, message_ts) rows."""
+    items = [row_to_message(data, payload) for _, data, payload, _ in rows]
+    if limit is not None and rows and len(rows) >= limit:
+        last_key, _, _, last_timestamp = rows[-1]
+        return MemoryPage(items, encode_cursor(str(last_timestamp), last_key))
+    return MemoryPage(items, None)
+
+def bulk_replace_statements(items : Dict[str,Dict[str,Any]], codec : MessageCodec) -> List[Tuple[str, tuple]]:
+    rows = [(key, *message_to_row(codec, data)) for key, data in items.items()]
+    statements = []
+    for start in range(0, len(rows), BULK_CHUNK_SIZE):
+        chunk = rows[start:start + BULK_CHUNK_SIZE]
+        placeholders = ", ".join(["(%s, %s, %s)"] * len(chunk))
+        params = tuple(value for row in chunk for value in row)
+        statements.append((f"REPLACE INTO memory (id, data, payload) VALUES {placeholders}", params))
+    return statements
+
+def bulk_select_statements(keys : List[str]) -> List[Tuple[str, tuple]]:
+    keys = list(keys)
+    statements = []
+    for start in range(0, len(keys), BULK_CHUNK_SIZE):
+        chunk = keys[start:start + BULK_CHUNK_SIZE]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        statements.append((f"SELECT id, data, payload FROM memory WHERE id IN ({placeholders})", tuple(chunk)))
+    return statements
+
+class _PooledConnection:
+    """A pooled connection with its own cache of prepared cursors, one per SQL string."""
+
+    def __init__(self, conn, statement_cache_size: int):
+        self.conn = conn
+        self.last_used = time.monotonic()
+        self._statements = OrderedDict()
+        self._statement_cache_size = statement_cache_size
+
+    def statement(self, sql: str):
+        cursor = self._statements.get(sql)
+        if cursor is not None:
+            self._statements.move_to_end(sql)
+            return cursor
+
+        cursor = self.conn.cursor(prepared=True)
+        self._statements[sql] = cursor
+        if len(self._statements) > self._statement_cache_size:
+            _, evicted = self._statements.popitem(last=False)
+            evicted.close()
+        return cursor
+
+    def close(self):
+        self._statements.clear()
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+class MySQLMemory(MemoryInterface):
+
+    def __init__(self, pool_size: Optional[int] = None, pool_timeout: Optional[float] = None,
+                 codec: Optional[MessageCodec] = None):
+        settings = get_settings()
+        # Generated columns read from data, so the fields they index must stay out of the payload
+        self._codec = (codec or get_message_codec()).with_clear_fields(INDEXED_COLUMNS)
+        self._pool_size = pool_size or settings.mysql_pool_size
+        self._pool_timeout = pool_timeout or settings.mysql_pool_timeout
+        self._ping_interval = settings.mysql_pool_ping_interval
+        self._statement_cache_size = settings.mysql_statement_cache_size
+
+        # LIFO keeps the most recently used connections warm and lets idle ones age out
+        self._pool = queue.LifoQueue(maxsize=self._pool_size)
+        self._pool_lock = threading.Lock()
+        # Signalled when a connection is checked in or a slot frees up, under _pool_lock
+        self._available = threading.Condition(self._pool_lock)
+        self._created = 0
 
         self._create_table()
+
+    def _connect(self):
+        settings = get_settings()
+        return mysql.connector.connect(
+            host = settings.mysql_host,
+            user = settings.mysql_user,
+            password = settings.mysql_password,
+            database = settings.mysql_db,
+            port = settings.mysql_port,
+            autocommit = True
+        )
+
+    def _new_pooled(self) -> _PooledConnection:
+        return _PooledConnection(self._connect(), self._statement_cache_size)
+
+    def _release_slot(self):
+        """Forget a connection that was closed or never opened, waking a caller waiting for capacity."""
+        with self._available:
+            self._created -= 1
+            self._available.notify()
+
+    def _checkout(self) -> _PooledConnection:
+        deadline = time.monotonic() + self._pool_timeout
+        with self._available:
+            while True:
+                try:
+                    pooled = self._pool.get_nowait()
+                    break
+                except queue.Empty:
+                    pass
+                if self._created < self._pool_size:
+                    self._created += 1
+                    pooled = None
+                    break
+                # Woken by a check-in, or by a discard that leaves room for a new connection
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No MySQL connection available within {self._pool_timeout}s")
+                self._available.wait(remaining)
+
+        if pooled is None:
+            try:
+                return self._new_pooled()
+            except Exception:
+                self._release_slot()
+                raise
+
+        # Only connections that sat idle are pinged, busy ones skip the round-trip
+        if time.monotonic() - pooled.last_used > self._ping_interval:
+            try:
+                pooled.conn.ping(reconnect=False)
+            except Exception:
+                pooled.close()
+                try:
+                    pooled = self._new_pooled()
+                except Exception:
+                    self._release_slot()
+                    raise
+        return pooled
+
+    def _checkin(self, pooled: _PooledConnection):
+        pooled.last_used = time.monotonic()
+        with self._available:
+            self._pool.put_nowait(pooled)
+            self._available.notify()
+
+    def _discard(self, pooled: _PooledConnection):
+        pooled.close()
+        self._release_slot()
+
+    @contextmanager
+    def _connection(self):
+        pooled = self._checkout()
+        try:
+            yield pooled
+        except CONNECTION_ERRORS:
+            self._discard(pooled)
+            raise
+        except Exception:
+            self._checkin(pooled)
+            raise
+        else:
+            self._checkin(pooled)
+
+    def _execute(self, sql: str, params: tuple = (), fetch: bool = False, prepared: bool = True):
+        """
+        Run sql on a pooled connection, retrying once on a fresh connection if the first one is dead.
+
+        Prepared cursors are cached per connection. Statements whose text changes
+        with the number of values (bulk VALUES / IN lists) should pass prepared=False.
+        """
+        for attempt in range(2):
+            try:
+                with self._connection() as pooled:
+                    cursor = pooled.statement(sql) if prepared else pooled.conn.cursor()
+                    try:
+                        cursor.execute(sql, params)
+                        if fetch:
+                            return cursor.fetchall()
+                        return cursor.rowcount
+                    finally:
+                        if not prepared:
+                            cursor.close()
+            except CONNECTION_ERRORS:
+                if attempt:
+                    raise
     
     def _create_table(self):
-        cursor = self._conn.cursor()
-        cursor.execute("""
-                CREATE TABLE IF NOT EXISTS memory (
-                id VARCHAR(255) PRIMARY KEY,
-                data JSON NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-            )
-        """)
-        self._conn.commit()
+        with self._connection() as pooled:
+            cursor = pooled.conn.cursor()
+            cursor.execute(create_table_sql())
+            cursor.close()
+
+            self._migrate_table(pooled.conn)
+
+    def _migrate_table(self, conn):
+        """Add the generated and extra columns and the indexes to a memory table created before they existed."""
+        cursor = conn.cursor()
+        cursor.execute(EXISTING_COLUMNS_SQL)
+        existing_columns = {row[0] for row in cursor.fetchall()}
+        cursor.execute(EXISTING_INDEXES_SQL)
+        existing_indexes = {row[0] for row in cursor.fetchall()}
+
+        for statement in migration_statements(existing_columns, existing_indexes):
+            cursor.execute(statement)
+
         cursor.close()
-    
-    def _ensure_connection(self):
-        if not self._conn.is_connected():
-            self._conn = mysql.connector.connect(
-                host = MYSQL_HOST,
-                user = MYSQL_USER,
-                password = MYSQL_PASSWORD,
-                database = MYSQL_DB,
-                port = MYSQL_PORT 
-            )
 
     def save(self, key, data):
         try:
-            self._ensure_connection()
-            cursor = self._conn.cursor()
-
-            json_data = json.dumps(data)
-
-            cursor.execute("REPLACE INTO memory (id, data) VALUES (%s, %s)",(key, json_data))
+            json_data, payload = message_to_row(self._codec, data)
 
-            self._conn.commit()
-            cursor.close()
+            self._execute("REPLACE INTO memory (id, data, payload) VALUES (%s, %s, %s)",(key, json_data, payload))
             return True
         except Exception:
             return False
     
     def load(self, key):
         try:
-            self._ensure_connection()
-            cursor = self._conn.cursor(dictionary=True)
-
-            cursor.execute(
-                "SELECT data FROM memory Where id = %s",(key,)
+            rows = self._execute(
+                "SELECT data, payload FROM memory WHERE id = %s",(key,), fetch=True
             )
 
-            result = cursor.fetchone()
-            cursor.close()
-
-            if result:
-                return json.loads(result["data"])
+            if rows:
+                return row_to_message(*rows[0])
             return None
         except Exception:
             return None
     
     def delete(self, key):
         try:
-            self._ensure_connection()
-            cursor = self._conn.cursor()
-
-            cursor.execute(
+            deleted = self._execute(
                 "DELETE FROM memory WHERE id = %s",(key,)
             )
 
-            self._conn.commit()
-            successful = cursor.rowcount > 0
-            cursor.close()
-
-
-            return successful
+            return deleted > 0
         except Exception:
             return False
         
-    def search(self, query):
+    def search(self, query, limit : Optional[int] = None, descending : bool = False):
+        # Encoded fields are not in the data column, they are matched after decoding and the limit with them
+        stored, encoded = self._codec.split_query(query)
         try:
-            self._ensure_connection()
-            cursor = self._conn.cursor(dictionary=True)
-
-            condtitions = []
-            params = []
-
-            for key, value in query.items():
-                condtitions.append(f"JSON_EXTRACT(data, '$.{key}') = %s")
-                params.append(json.dumps(value))
-            
-            where_clause = " AND ".join(condtitions) if condtitions else "1=1"
+            sql, params = build_search_sql(stored, None if encoded else limit, descending)
+            rows = self._execute(sql, params, fetch=True)
 
-            cursor.execute(
-                f"SELECT data FROM memory WHERE {where_clause}",tuple(params)
-            )
+            return filter_rows(rows, encoded, limit)
+        except Exception:
+            return []
 
-            results = []
-            for row in cursor.fetchall():
-                results.append(json.loads(row["data"]))
+    def save_many(self, items : Dict[str,Dict[str,Any]]) -> bool:
+        try:
+            for sql, params in bulk_replace_statements(items, self._codec):
+                self._execute(sql, params, prepared=False)
+            return True
+        except Exception:
+            return False
 
-            cursor.close()
+    def load_many(self, keys : List[str]) -> Dict[str,Dict[str,Any]]:
+        try:
+            results = {}
+            for sql, params in bulk_select_statements(keys):
+                rows = self._execute(sql, params, fetch=True, prepared=False)
+                for key, data, payload in rows:
+                    results[key] = row_to_message(data, payload)
             return results
         except Exception:
-            return []
-        
\ No newline at end of file
+            return {}
+
+    def query_range(self, conversation_id : str, since : Optional[float] = None, until : Optional[float] = None,
+                    limit : Optional[int] = None, descending : bool = False, cursor : Optional[str] = None) -> MemoryPage:
+        sql, params = build_range_sql(conversation_id, since, until, limit, descending, cursor)
+        try:
+            rows = self._execute(sql, params, fetch=True)
+        except Exception:
+            return MemoryPage([], None)
+        return page_from_rows(rows, limit)
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self._pool.get_nowait())
+            except queue.Empty:
+                break
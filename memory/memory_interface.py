@@ -1,9 +1,58 @@
+import base64
+import heapq
+import json
+from itertools import islice
 from abc import ABC,abstractmethod
-from typing import Dict,List,Any,Optional
+from typing import Dict,List,Any,Optional,NamedTuple,Tuple,Iterable
+
+class MemoryPage(NamedTuple):
+    """One page of a range query. next_cursor is None when there is nothing more to read."""
+    items: List[Dict[str,Any]]
+    next_cursor: Optional[str]
+
+def encode_cursor(timestamp : Any, key : str) -> str:
+    """Opaque page cursor pointing just past the entry (timestamp, key)."""
+    return base64.urlsafe_b64encode(json.dumps([timestamp, key]).encode()).decode()
+
+def decode_cursor(cursor : str) -> Tuple[Any, str]:
+    timestamp, key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return timestamp, key
+
+def memory_key(conversation_id : str, data : Dict[str,Any]) -> str:
+    """Storage key of a conversation message, shared by every backend."""
+    return f"{conversation_id}:{data.get('timestamp', 'unknown')}"
+
+def message_sort_key(data : Dict[str,Any]) -> Tuple[Any, str]:
+    """Stable identity and order of a stored message: (timestamp, conversation_id)."""
+    return (data.get("timestamp", 0), data.get("conversation_id") or "")
+
+def merge_messages(sources : Iterable[List[Dict[str,Any]]], descending : bool = False,
+                   limit : Optional[int] = None) -> List[Dict[str,Any]]:
+    """
+    Merge message lists that are each already ordered by timestamp.
+
+    Messages with the same (timestamp, conversation_id) are kept once, taking
+    the copy from the earliest source. Runs in linear time over the inputs.
+    """
+    merged = heapq.merge(*sources, key=message_sort_key, reverse=descending)
+
+    def unique():
+        last_key = None
+        for data in merged:
+            key = message_sort_key(data)
+            if key != last_key:
+                last_key = key
+                yield data
+
+    return list(islice(unique(), limit))
 
 class MemoryInterface(ABC):
     """Abstract base class"""
 
+    # Whether calls do network or disk I/O. Async callers run blocking backends
+    # in a worker thread and call in-process ones directly.
+    blocking = True
+
     @abstractmethod
     def save(self, key : str, data : Dict[str,Any]) -> bool:
         pass
@@ -17,5 +66,27 @@ class MemoryInterface(ABC):
         pass
 
     @abstractmethod
-    def search(self, query : Dict[str,Any]) -> List[Dict[str,Any]]:
-        pass
\ No newline at end of file
+    def search(self, query : Dict[str,Any], limit : Optional[int] = None, descending : bool = False) -> List[Dict[str,Any]]:
+        """Entries matching query, ordered by timestamp (newest first if descending), at most limit of them."""
+        pass
+
+    @abstractmethod
+    def save_many(self, items : Dict[str,Dict[str,Any]]) -> bool:
+        """Save every key -> data pair in as few round-trips as the backend allows."""
+        pass
+
+    @abstractmethod
+    def load_many(self, keys : List[str]) -> Dict[str,Dict[str,Any]]:
+        """Load several keys at once. Keys that are not found are left out of the result."""
+        pass
+
+    @abstractmethod
+    def query_range(self, conversation_id : str, since : Optional[float] = None, until : Optional[float] = None,
+                    limit : Optional[int] = None, descending : bool = False, cursor : Optional[str] = None) -> MemoryPage:
+        """
+        Page through one conversation's entries ordered by (timestamp, key).
+
+        since is inclusive and until is exclusive. Pass the returned next_cursor
+        back in, with the same ordering, to continue after the last entry.
+        """
+        pass
@@ -0,0 +1,96 @@
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Dict, Any, Iterator
+
+_UNSET = object()
+
+@lru_cache(maxsize=None)
+def _provider_classes() -> Dict[str, type]:
+    # Imported on first conversion so memory does not depend on LangChain
+    from langchain.schema import HumanMessage, AIMessage, SystemMessage
+    return {"user": HumanMessage, "assistant": AIMessage, "system": SystemMessage}
+
+class Message(Mapping):
+    """
+    One conversation message, as a slotted record instead of a dict.
+
+    Reads like a read-only dict (get, [], items, dict(message)), so anything
+    handling stored messages accepts either. Fields that were never given are
+    absent, like missing dict keys. to_provider() builds the LangChain message
+    on first use and keeps it, so a record held in short-term memory is only
+    converted once however many turns reuse it. Token counts are kept the same way.
+    """
+
+    __slots__ = ("conversation_id", "role", "content", "timestamp", "tool_results", "_extra", "_provider", "_tokens")
+
+    FIELDS = ("conversation_id", "role", "content", "timestamp", "tool_results")
+
+    def __init__(self, role=_UNSET, content=_UNSET, conversation_id=_UNSET, timestamp=_UNSET,
+                 tool_results=_UNSET, **extra):
+        for field, value in (("conversation_id", conversation_id), ("role", role), ("content", content),
+                             ("timestamp", timestamp), ("tool_results", tool_results)):
+            if value is not _UNSET:
+                object.__setattr__(self, field, value)
+        object.__setattr__(self, "_extra", extra or None)
+        object.__setattr__(self, "_provider", _UNSET)
+        object.__setattr__(self, "_tokens", None)
+
+    @classmethod
+    def from_dict(cls, data : Dict[str,Any]) -> "Message":
+        return cls(**data)
+
+    @classmethod
+    def coerce(cls, data) -> "Message":
+        return data if isinstance(data, Message) else cls.from_dict(data)
+
+    def to_dict(self) -> Dict[str,Any]:
+        return dict(self.items())
+
+    def to_provider(self):
+        """The LangChain message for this record, or None for roles the providers do not take."""
+        if self._provider is _UNSET:
+            message_class = _provider_classes().get(self.get("role", "user"))
+            provider = message_class(content=self.get("content", "")) if message_class else None
+            object.__setattr__(self, "_provider", provider)
+        return self._provider
+
+    def token_count(self, counter) -> int:
+        """Tokens this message takes in a prompt, counted once per tokenizer."""
+        counts = self._tokens
+        if counts is None:
+            counts = {}
+            object.__setattr__(self, "_tokens", counts)
+        if counter.name not in counts:
+            counts[counter.name] = counter.count_message(self)
+        return counts[counter.name]
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Message records are read-only")
+
+    def __reduce__(self):
+        # Rebuilt through the constructor, so copy, deepcopy and pickle work despite
+        # the read-only slots. The provider message and token counts are rebuilt on use.
+        return (type(self).from_dict, (self.to_dict(),))
+
+    def __getitem__(self, field : str) -> Any:
+        if field in self.FIELDS:
+            try:
+                return getattr(self, field)
+            except AttributeError:
+                raise KeyError(field) from None
+        if self._extra is not None and field in self._extra:
+            return self._extra[field]
+        raise KeyError(field)
+
+    def __iter__(self) -> Iterator[str]:
+        for field in self.FIELDS:
+            if hasattr(self, field):
+                yield field
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"Message({self.to_dict()!r})"
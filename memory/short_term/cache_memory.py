@@ -1,78 +1,242 @@
+import sys
 import time
-from typing import Dict, List, Optional, Any
-from collections import OrderedDict
-from memory.memory_interface import MemoryInterface
-from config.settings import SHORT_TERM_MEMORY_EXPIRATION, CACHE_MAX_SIZE
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+from collections import OrderedDict, defaultdict
+from collections.abc import Mapping
+from memory.memory_interface import MemoryInterface, MemoryPage, encode_cursor, decode_cursor
+from memory.codec import MessageCodec, get_message_codec
+from memory.message import Message
+from config.settings import get_settings
 
-class CacheMemory(MemoryInterface):
+class _CacheUsage:
+    """Entry and byte totals across all shards of a CacheMemory, its size limits apply to these."""
+
+    def __init__(self, max_size: int, max_bytes: int):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.entries = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, entries: int, size: int):
+        with self._lock:
+            self.entries += entries
+            self.bytes += size
+
+    def over_limit(self) -> bool:
+        return self.entries > self.max_size or self.bytes > self.max_bytes
+
+class _CacheShard:
+    """One partition of CacheMemory. Not thread-safe, CacheMemory holds the shard's lock around every call."""
 
-    def __init__(self):
+    # Upper bound on expired entries reclaimed by a single save
+    EXPIRE_BATCH = 128
+
+    def __init__(self, indexed_fields: Iterable[str], usage: _CacheUsage, expiration_time: float,
+                 codec: MessageCodec):
+        # Entries are stored packed, indexed fields stay in the clear
+        self._codec = codec
         self._cache = OrderedDict()
-        self._timestamp = {}
-        self._max_size = CACHE_MAX_SIZE
-        self._expiration_time = SHORT_TERM_MEMORY_EXPIRATION
+        # key -> last access time, oldest first. Every refresh moves the key to the
+        # end and the TTL is the same for all keys, so expired keys sit at the front.
+        self._timestamp = OrderedDict()
+        # Shared with the other shards, CacheMemory evicts across shards against it
+        self._usage = usage
+        self._expiration_time = expiration_time
+
+        # Approximate in-memory footprint per entry, evicted against the cache's max_bytes
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "rejected": 0}
+
+        # conversation_id -> [(message timestamp, key)] kept sorted, so a history
+        # lookup only touches that conversation's entries and needs no sort.
+        self._conversations: Dict[Any, List[Tuple[Any, str]]] = {}
+        # field -> value -> keys, for the other equality lookups done through search
+        self._indexes: Dict[str, Dict[Any, set]] = {
+            field: defaultdict(set) for field in indexed_fields if field != "conversation_id"
+        }
+
+    @classmethod
+    def _estimate_size(cls, value: Any) -> int:
+        """Rough deep size of a stored value in bytes."""
+        size = sys.getsizeof(value)
+        if isinstance(value, Mapping):
+            for k, v in value.items():
+                size += cls._estimate_size(k) + cls._estimate_size(v)
+        elif isinstance(value, (list, tuple, set)):
+            for item in value:
+                size += cls._estimate_size(item)
+        return size
+
+    @staticmethod
+    def _sort_key(key: str, data: Dict[str, Any]) -> Tuple[Any, str]:
+        return (data.get("timestamp", 0), key)
 
-    def _evect_if_needed(self):
+    def _index_add(self, key: str, data: Dict[str, Any]):
+        conversation_id = data.get("conversation_id")
+        if conversation_id is not None:
+            insort(self._conversations.setdefault(conversation_id, []), self._sort_key(key, data))
+
+        for field, index in self._indexes.items():
+            value = data.get(field)
+            try:
+                index[value].add(key)
+            except TypeError:
+                # Unhashable values are left to the scan in search
+                pass
+
+    def _index_remove(self, key: str, data: Dict[str, Any]):
+        conversation_id = data.get("conversation_id")
+        entries = self._conversations.get(conversation_id)
+        if entries is not None:
+            sort_key = self._sort_key(key, data)
+            position = bisect_left(entries, sort_key)
+            if position < len(entries) and entries[position] == sort_key:
+                entries.pop(position)
+            if not entries:
+                del self._conversations[conversation_id]
+
+        for field, index in self._indexes.items():
+            value = data.get(field)
+            try:
+                keys = index.get(value)
+            except TypeError:
+                continue
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[value]
+
+    def _read(self, key: str) -> Message:
+        return Message.coerce(self._codec.unpack(self._cache[key]))
+
+    def _remove(self, key: str):
+        data = self._cache.pop(key, None)
+        self._timestamp.pop(key, None)
+        size = self._sizes.pop(key, 0)
+        self._bytes -= size
+        if data is not None:
+            self._index_remove(key, data)
+            self._usage.add(-1, -size)
+
+    def purge_expired(self, limit: Optional[int] = None) -> int:
+        """Remove up to limit expired entries (all of them if None) and return the count."""
         current_time = time.time()
+        removed = 0
 
-        expired_keys = [k for k, ts in self._timestamp.items() 
-                        if current_time - ts > self._expiration_time]
-        
-        for key in expired_keys:
-            if key in self._cache:
-                self._cache.pop(key)
-            self._timestamp.pop(key)
-        
-        while len(self._cache) > self._max_size:
-            oldest_key, _ = self._cache.popitem(last=False)
-            if oldest_key in self._timestamp:
-                self._timestamp.pop(oldest_key)
+        while self._timestamp and (limit is None or removed < limit):
+            key = next(iter(self._timestamp))
+            if current_time - self._timestamp[key] <= self._expiration_time:
+                break
+            self._remove(key)
+            removed += 1
+        self._stats["expirations"] += removed
+        return removed
+
+    def oldest_access(self) -> Optional[float]:
+        """Last access time of the least recently used entry, None when the shard is empty."""
+        if not self._timestamp:
+            return None
+        return self._timestamp[next(iter(self._timestamp))]
+
+    def evict_oldest(self):
+        if self._timestamp:
+            self._remove(next(iter(self._timestamp)))
+            self._stats["evictions"] += 1
     
     def save(self, key : str, data: Dict[str, Any]) -> bool:
         try:
+            # Kept as slotted Message records unless a codec packs them
+            data = self._codec.pack(Message.coerce(data))
+            size = self._estimate_size(key) + self._estimate_size(data)
+            if size > self._usage.max_bytes:
+                # Would evict the whole cache and still not fit
+                self._stats["rejected"] += 1
+                return False
+
             if key in self._cache:
-                self._cache.pop(key)
+                self._remove(key)
             self._cache[key] = data
             self._timestamp[key] = time.time()
+            self._sizes[key] = size
+            self._bytes += size
+            self._index_add(key, data)
+            self._usage.add(1, size)
 
-            self._evect_if_needed()
+            # Size limits are enforced across shards by CacheMemory, after the shard lock is released
+            self.purge_expired(self.EXPIRE_BATCH)
             return True
         except Exception:
             return False
 
     def load(self, key: str) -> Optional[Dict[str, Any]]:
         if key not in self._cache:
+            self._stats["misses"] += 1
             return None
         
         current_time = time.time()
         if current_time - self._timestamp.get(key,0) > self._expiration_time:
             self.delete(key)
+            self._stats["expirations"] += 1
+            self._stats["misses"] += 1
             return None
         
-        data = self._cache.pop(key)
-        self._cache[key] = data
+        self._stats["hits"] += 1
+        self._cache.move_to_end(key)
         self._timestamp[key] = current_time
+        self._timestamp.move_to_end(key)
 
-        return data
+        return self._read(key)
     
     def delete(self, key: str) -> bool:
         try:
-            if key in self._cache:
-                self._cache.pop(key)
-            if key in self._timestamp:
-                self._timestamp.pop(key)
+            self._remove(key)
             return True
         except Exception:
             return False
+
+    def _candidate_keys(self, query: Dict[str, Any]) -> Optional[List[str]]:
+        """Narrow the query to keys from the smallest matching index, or None to scan."""
+        if "conversation_id" in query:
+            entries = self._conversations.get(query["conversation_id"], ())
+            return [key for _, key in entries]
+
+        best = None
+        for field, index in self._indexes.items():
+            if field not in query:
+                continue
+            try:
+                keys = index.get(query[field], ())
+            except TypeError:
+                continue
+            if best is None or len(keys) < len(best):
+                best = keys
+        if best is None:
+            return None
+        return sorted(best, key=lambda k: self._sort_key(k, self._cache[k]))
         
-    def search(self, query : Dict[str,Any]) -> List[Dict[str,Any]]:
-        results = []
+    def search(self, query : Dict[str,Any], count: bool = True) -> List[Dict[str,Any]]:
+        """
+        Return this shard's unexpired entries matching query.
+
+        Indexed lookups only visit the matching entries and come back ordered by
+        message timestamp. With count=False the caller does the hit/miss accounting.
+        """
+        candidates = self._candidate_keys(query)
+        if candidates is None:
+            candidates = list(self._cache.keys())
 
-        for key, data in self._cache.items():
+        results = []
+        current_time = time.time()
 
-            current_time = time.time()
+        for key in candidates:
             if current_time - self._timestamp.get(key,0) > self._expiration_time:
                 continue
+
+            data = self._read(key)
             
             match = True
             for query_key, query_value in query.items():
@@ -82,5 +246,209 @@ class CacheMemory(MemoryInterface):
         
             if match:
                 results.append(data)
-        
+
+        if count:
+            self._stats["hits" if results else "misses"] += 1
         return results
+
+    def query_range(self, conversation_id: Any, since: Optional[float], until: Optional[float],
+                    limit: Optional[int], descending: bool,
+                    after: Optional[Tuple[Any, str]]) -> Tuple[List[Dict[str, Any]], Optional[Tuple[Any, str]]]:
+        """Slice the conversation's sorted entries by bisection, returning the items and the last (timestamp, key) read."""
+        entries = self._conversations.get(conversation_id, [])
+        lo = 0 if since is None else bisect_left(entries, (since,))
+        hi = len(entries) if until is None else bisect_left(entries, (until,))
+        if after is not None:
+            if descending:
+                hi = min(hi, bisect_left(entries, after))
+            else:
+                lo = max(lo, bisect_right(entries, after))
+
+        positions = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+        current_time = time.time()
+        items = []
+        last = None
+
+        for position in positions:
+            sort_key = entries[position]
+            key = sort_key[1]
+            if current_time - self._timestamp.get(key, 0) > self._expiration_time:
+                continue
+            items.append(self._read(key))
+            last = sort_key
+            if limit is not None and len(items) >= limit:
+                return items, last
+        return items, None
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "entries": len(self._cache), "bytes": self._bytes}
+
+
+class CacheMemory(MemoryInterface):
+    """
+    In-process short-term memory, split into shards by conversation_id.
+
+    Each shard has its own lock, so concurrent turns for different conversations
+    never contend and a search never sees a shard mid-update. Keys are expected
+    to look like "{conversation_id}:{suffix}", as BaseAgent.save_to_memory builds
+    them, so a key and its conversation's history always live in the same shard.
+    CACHE_MAX_SIZE and CACHE_MAX_BYTES bound the cache as a whole: a full cache
+    evicts its least recently used entry whichever shard holds it, so a single
+    conversation can use the whole capacity. Entries are held and returned as
+    Message records.
+    """
+
+    blocking = False
+
+    def __init__(self, indexed_fields: Iterable[str] = ("role",), shards: Optional[int] = None,
+                 codec: Optional[MessageCodec] = None):
+        settings = get_settings()
+        shard_count = shards or settings.cache_shards
+        self._usage = _CacheUsage(settings.cache_max_size, settings.cache_max_bytes)
+        indexed_fields = tuple(indexed_fields)
+        codec = (codec or get_message_codec(settings.cache_codec)).with_clear_fields(indexed_fields)
+
+        self._shards = [
+            _CacheShard(
+                indexed_fields,
+                usage=self._usage,
+                expiration_time=settings.short_term_memory_expiration,
+                codec=codec
+            )
+            for _ in range(shard_count)
+        ]
+        self._locks = [threading.Lock() for _ in range(shard_count)]
+
+        # Hit/miss counters for searches that span every shard
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def _shard_index(self, conversation_id: Any) -> int:
+        return hash(conversation_id) % len(self._shards)
+
+    def _key_shard_index(self, key: str) -> int:
+        return self._shard_index(key.rsplit(":", 1)[0])
+
+    @property
+    def max_size(self) -> int:
+        """Most entries the whole cache holds."""
+        return self._usage.max_size
+
+    def _evict_if_needed(self):
+        """Evict least recently used entries, from whichever shard holds them, until the cache fits its limits."""
+        # Only one shard lock is held at a time, so concurrent saves cannot deadlock
+        while self._usage.over_limit():
+            oldest = None
+            for index, (shard, lock) in enumerate(zip(self._shards, self._locks)):
+                with lock:
+                    accessed = shard.oldest_access()
+                if accessed is not None and (oldest is None or accessed < oldest[0]):
+                    oldest = (accessed, index)
+            if oldest is None:
+                return
+            with self._locks[oldest[1]]:
+                self._shards[oldest[1]].evict_oldest()
+
+    def save(self, key : str, data: Dict[str, Any]) -> bool:
+        index = self._key_shard_index(key)
+        with self._locks[index]:
+            saved = self._shards[index].save(key, data)
+        self._evict_if_needed()
+        return saved
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        index = self._key_shard_index(key)
+        with self._locks[index]:
+            return self._shards[index].load(key)
+
+    def delete(self, key: str) -> bool:
+        index = self._key_shard_index(key)
+        with self._locks[index]:
+            return self._shards[index].delete(key)
+
+    def search(self, query : Dict[str,Any], limit : Optional[int] = None, descending : bool = False) -> List[Dict[str,Any]]:
+        """
+        Return the unexpired entries whose fields equal every value in query.
+
+        A conversation_id lookup only locks and visits that conversation's shard.
+        Other queries visit every shard, one lock at a time, and the merged
+        results are ordered by message timestamp.
+        """
+        if "conversation_id" in query:
+            index = self._shard_index(query["conversation_id"])
+            with self._locks[index]:
+                results = self._shards[index].search(query)
+        else:
+            results = []
+            for shard, lock in zip(self._shards, self._locks):
+                with lock:
+                    results.extend(shard.search(query, count=False))
+            results.sort(key=lambda data: data.get("timestamp", 0))
+
+            with self._stats_lock:
+                self._stats["hits" if results else "misses"] += 1
+
+        if descending:
+            results.reverse()
+        if limit is not None:
+            results = results[:limit]
+        return results
+
+    def save_many(self, items : Dict[str,Dict[str,Any]]) -> bool:
+        by_shard: Dict[int, List[Tuple[str, Dict[str, Any]]]] = defaultdict(list)
+        for key, data in items.items():
+            by_shard[self._key_shard_index(key)].append((key, data))
+
+        saved = True
+        for index, shard_items in by_shard.items():
+            with self._locks[index]:
+                shard = self._shards[index]
+                for key, data in shard_items:
+                    saved = shard.save(key, data) and saved
+        self._evict_if_needed()
+        return saved
+
+    def load_many(self, keys : List[str]) -> Dict[str,Dict[str,Any]]:
+        by_shard: Dict[int, List[str]] = defaultdict(list)
+        for key in keys:
+            by_shard[self._key_shard_index(key)].append(key)
+
+        results = {}
+        for index, shard_keys in by_shard.items():
+            with self._locks[index]:
+                shard = self._shards[index]
+                for key in shard_keys:
+                    data = shard.load(key)
+                    if data is not None:
+                        results[key] = data
+        return results
+
+    def query_range(self, conversation_id : str, since : Optional[float] = None, until : Optional[float] = None,
+                    limit : Optional[int] = None, descending : bool = False, cursor : Optional[str] = None) -> MemoryPage:
+        after = tuple(decode_cursor(cursor)) if cursor else None
+        index = self._shard_index(conversation_id)
+        with self._locks[index]:
+            items, last = self._shards[index].query_range(conversation_id, since, until, limit, descending, after)
+        return MemoryPage(items, encode_cursor(*last) if last else None)
+
+    def purge_expired(self, limit: Optional[int] = None) -> int:
+        """Remove expired entries from every shard, at most limit per shard, and return the count."""
+        removed = 0
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                removed += shard.purge_expired(limit)
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss/eviction counters with the current entry count and byte usage."""
+        with self._stats_lock:
+            totals = dict(self._stats)
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                for name, value in shard.stats().items():
+                    totals[name] = totals.get(name, 0) + value
+
+        totals["max_size"] = self._usage.max_size
+        totals["max_bytes"] = self._usage.max_bytes
+        totals["shards"] = len(self._shards)
+        return totals
@@ -0,0 +1,142 @@
+import asyncio
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple, Union
+from memory.memory_interface import MemoryInterface, MemoryPage, memory_key
+from memory.async_memory_interface import AsyncMemoryInterface, call_memory
+from config.settings import get_settings
+
+AnyMemory = Union[MemoryInterface, AsyncMemoryInterface]
+
+class TieredMemory(AsyncMemoryInterface):
+    """
+    Read-through short-term memory backed by long-term storage.
+
+    Writes only go to the cache. A conversation lookup that finds nothing in
+    the cache, for example after its entries expired or a restart, does one
+    bounded range read of the newest messages from long-term storage, fills
+    the cache and answers from it. Concurrent misses for the same conversation
+    share a single long-term read.
+
+    The read is no larger than the cache can hold, nor than the caller asked
+    for when it wants the newest few messages. A later caller that needs more
+    of a partly warmed conversation triggers a deeper read.
+    """
+
+    # Conversations whose warm-up depth is remembered, least recently warmed are forgotten first
+    WARM_DEPTH_ENTRIES = 10000
+
+    def __init__(self, cache: AnyMemory, long_term: AnyMemory, warmup_limit: Optional[int] = None):
+        self._cache = cache
+        self._long_term = long_term
+        self._warmup_limit = warmup_limit or get_settings().tiered_warmup_limit
+        # conversation_id -> (in-flight long-term read, messages it asked for)
+        self._warming: Dict[str, Tuple[asyncio.Future, int]] = {}
+        # conversation_id -> newest messages warmed from long-term, inf when that was all of them
+        self._warm_depth: "OrderedDict[str, float]" = OrderedDict()
+        self._stats = {"warmups": 0, "coalesced": 0, "warmed_entries": 0, "load_fallbacks": 0}
+
+    async def _is_cached(self, conversation_id: str) -> bool:
+        page = await call_memory(self._cache, "query_range", conversation_id, limit=1)
+        return bool(page.items)
+
+    def _warmup_size(self, limit: Optional[int] = None) -> int:
+        size = self._warmup_limit
+        # More than the cache holds would evict the warmed entries and other conversations' too
+        capacity = getattr(self._cache, "max_size", None)
+        if capacity:
+            size = min(size, capacity)
+        if limit:
+            size = min(size, limit)
+        return size
+
+    async def _is_warm(self, conversation_id: str, size: int) -> bool:
+        if not await self._is_cached(conversation_id):
+            self._warm_depth.pop(conversation_id, None)
+            return False
+        # Cached but never warmed means the conversation was written through this cache
+        return self._warm_depth.get(conversation_id, float("inf")) >= size
+
+    async def _load_conversation(self, conversation_id: str, size: int) -> int:
+        page = await call_memory(
+            self._long_term, "query_range", conversation_id, limit=size, descending=True
+        )
+        if page.items:
+            await call_memory(self._cache, "save_many", {memory_key(conversation_id, data): data for data in page.items})
+
+        depth = float("inf") if len(page.items) < size else size
+        self._warm_depth[conversation_id] = max(depth, self._warm_depth.get(conversation_id, 0))
+        self._warm_depth.move_to_end(conversation_id)
+        while len(self._warm_depth) > self.WARM_DEPTH_ENTRIES:
+            self._warm_depth.popitem(last=False)
+
+        self._stats["warmups"] += 1
+        self._stats["warmed_entries"] += len(page.items)
+        return len(page.items)
+
+    async def _ensure_warm(self, conversation_id: str, limit: Optional[int] = None):
+        size = self._warmup_size(limit)
+        if await self._is_warm(conversation_id, size):
+            return
+
+        warming = self._warming.get(conversation_id)
+        if warming is not None and warming[1] >= size:
+            task = warming[0]
+            self._stats["coalesced"] += 1
+        else:
+            # Nothing in flight, or a read too shallow for this caller
+            task = asyncio.ensure_future(self._load_conversation(conversation_id, size))
+            self._warming[conversation_id] = (task, size)
+
+            def finished(done):
+                if self._warming.get(conversation_id, (None,))[0] is done:
+                    del self._warming[conversation_id]
+            task.add_done_callback(finished)
+        # Shielded so one cancelled caller does not abort the read the others wait on
+        await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        cache_stats = self._cache.stats() if hasattr(self._cache, "stats") else {}
+        return {**cache_stats, **self._stats}
+
+    async def save(self, key : str, data : Dict[str,Any]) -> bool:
+        return await call_memory(self._cache, "save", key, data)
+
+    async def save_many(self, items : Dict[str,Dict[str,Any]]) -> bool:
+        return await call_memory(self._cache, "save_many", items)
+
+    async def delete(self, key : str) -> bool:
+        return await call_memory(self._cache, "delete", key)
+
+    async def load(self, key : str) -> Optional[Dict[str,Any]]:
+        data = await call_memory(self._cache, "load", key)
+        if data is None:
+            data = await call_memory(self._long_term, "load", key)
+            if data is not None:
+                self._stats["load_fallbacks"] += 1
+                await call_memory(self._cache, "save", key, data)
+        return data
+
+    async def load_many(self, keys : List[str]) -> Dict[str,Dict[str,Any]]:
+        results = await call_memory(self._cache, "load_many", keys)
+        missing = [key for key in keys if key not in results]
+        if missing:
+            found = await call_memory(self._long_term, "load_many", missing)
+            if found:
+                self._stats["load_fallbacks"] += len(found)
+                await call_memory(self._cache, "save_many", found)
+                results.update(found)
+        return results
+
+    async def search(self, query : Dict[str,Any], limit : Optional[int] = None, descending : bool = False) -> List[Dict[str,Any]]:
+        if "conversation_id" in query:
+            # The limit only bounds the read when it applies to the newest messages of the conversation
+            newest = limit if descending and len(query) == 1 else None
+            await self._ensure_warm(query["conversation_id"], newest)
+        return await call_memory(self._cache, "search", query, limit=limit, descending=descending)
+
+    async def query_range(self, conversation_id : str, since : Optional[float] = None, until : Optional[float] = None,
+                          limit : Optional[int] = None, descending : bool = False, cursor : Optional[str] = None) -> MemoryPage:
+        newest = limit if descending and since is None and until is None and cursor is None else None
+        await self._ensure_warm(conversation_id, newest)
+        return await call_memory(self._cache, "query_range", conversation_id, since=since, until=until,
+                                 limit=limit, descending=descending, cursor=cursor)
@@ -0,0 +1,189 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple, Union
+from memory.memory_interface import MemoryInterface, MemoryPage
+from memory.async_memory_interface import AsyncMemoryInterface, call_memory
+from config.logger import get_logger
+from config.settings import get_settings
+
+logger = get_logger(__name__)
+
+# Queued in place of data to mark a pending delete
+_DELETED = object()
+
+class WriteBehindMemory(AsyncMemoryInterface):
+    """
+    Long-term memory wrapper that acknowledges writes once they are queued.
+
+    A background task drains the queue in batches into the wrapped backend's
+    save_many, retrying failed batches with exponential backoff. The queue is
+    bounded, so producers wait when the backend falls behind. close() flushes
+    everything still queued before closing the backend. Reads go straight to
+    the backend, except load(), which also sees writes that are still queued.
+    """
+
+    def __init__(self, backend: Union[MemoryInterface, AsyncMemoryInterface],
+                 batch_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None,
+                 queue_size: Optional[int] = None,
+                 max_retries: Optional[int] = None):
+        settings = get_settings()
+        self._backend = backend
+        self._batch_size = batch_size or settings.write_behind_batch_size
+        self._flush_interval = flush_interval or settings.write_behind_flush_interval
+        self._max_retries = max_retries if max_retries is not None else settings.write_behind_max_retries
+
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or settings.write_behind_queue_size)
+        # key -> latest queued data (or _DELETED), so load() can read its own writes
+        self._pending: Dict[str, Any] = {}
+        self._closing = False
+        self._worker: Optional[asyncio.Task] = None
+
+        self._stats = {
+            "enqueued": 0, "flushed": 0, "failed": 0, "retries": 0,
+            "batches": 0, "backpressure_waits": 0
+        }
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._latency_last = 0.0
+
+    async def initialize(self):
+        if isinstance(self._backend, AsyncMemoryInterface):
+            await self._backend.initialize()
+        self._worker = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        """Stop accepting writes, flush the queue and close the backend."""
+        self._closing = True
+        if self._worker is not None:
+            await self._worker
+        if isinstance(self._backend, AsyncMemoryInterface):
+            await self._backend.close()
+        elif hasattr(self._backend, "close"):
+            await asyncio.to_thread(self._backend.close)
+
+    async def _enqueue(self, key: str, data: Any) -> bool:
+        if self._closing:
+            return False
+        if self._queue.full():
+            self._stats["backpressure_waits"] += 1
+        await self._queue.put((key, data, time.monotonic()))
+        self._pending[key] = data
+        self._stats["enqueued"] += 1
+        return True
+
+    async def _next_batch(self) -> List[Tuple[str, Any, float]]:
+        """Wait for the first write, then collect more until batch_size or flush_interval."""
+        try:
+            batch = [await asyncio.wait_for(self._queue.get(), timeout=self._flush_interval)]
+        except asyncio.TimeoutError:
+            return []
+
+        deadline = time.monotonic() + self._flush_interval
+        while len(batch) < self._batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if self._closing or remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+        return batch
+
+    async def _write(self, saves: Dict[str, Dict[str, Any]], deletes: List[str]) -> bool:
+        ok = True
+        if saves:
+            ok = await call_memory(self._backend, "save_many", saves)
+        for key in deletes:
+            # A missing key is not a failure here
+            await call_memory(self._backend, "delete", key)
+        return ok
+
+    async def _flush(self, batch: List[Tuple[str, Any, float]]):
+        # Later writes to the same key in a batch replace earlier ones
+        latest: "OrderedDict[str, Any]" = OrderedDict()
+        for key, data, _ in batch:
+            latest[key] = data
+            latest.move_to_end(key)
+        saves = {key: data for key, data in latest.items() if data is not _DELETED}
+        deletes = [key for key, data in latest.items() if data is _DELETED]
+
+        for attempt in range(self._max_retries + 1):
+            try:
+                ok = await self._write(saves, deletes)
+            except Exception as e:
+                logger.error(f"Write-behind flush error: {e}")
+                ok = False
+            if ok:
+                break
+            if attempt < self._max_retries:
+                self._stats["retries"] += 1
+                await asyncio.sleep(min(0.1 * 2 ** attempt, 5.0))
+        else:
+            self._stats["failed"] += len(batch)
+            logger.error(f"Write-behind dropped {len(batch)} writes after {self._max_retries} retries")
+
+        now = time.monotonic()
+        for key, data, enqueued_at in batch:
+            if self._pending.get(key, None) is data:
+                del self._pending[key]
+            latency = now - enqueued_at
+            self._latency_total += latency
+            self._latency_max = max(self._latency_max, latency)
+            self._latency_last = latency
+        if ok:
+            self._stats["flushed"] += len(batch)
+        self._stats["batches"] += 1
+
+    async def _flush_loop(self):
+        while not (self._closing and self._queue.empty()):
+            batch = await self._next_batch()
+            if batch:
+                await self._flush(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, write counters and enqueue-to-durable latency in seconds."""
+        completed = self._stats["flushed"] + self._stats["failed"]
+        return {
+            **self._stats,
+            "queue_depth": self._queue.qsize(),
+            "latency_avg": self._latency_total / completed if completed else 0.0,
+            "latency_max": self._latency_max,
+            "latency_last": self._latency_last
+        }
+
+    async def save(self, key : str, data : Dict[str,Any]) -> bool:
+        return await self._enqueue(key, data)
+
+    async def save_many(self, items : Dict[str,Dict[str,Any]]) -> bool:
+        saved = True
+        for key, data in items.items():
+            saved = await self._enqueue(key, data) and saved
+        return saved
+
+    async def delete(self, key : str) -> bool:
+        return await self._enqueue(key, _DELETED)
+
+    async def load(self, key : str) -> Optional[Dict[str,Any]]:
+        if key in self._pending:
+            data = self._pending[key]
+            return None if data is _DELETED else data
+        return await call_memory(self._backend, "load", key)
+
+    async def load_many(self, keys : List[str]) -> Dict[str,Dict[str,Any]]:
+        results = await call_memory(self._backend, "load_many", [key for key in keys if key not in self._pending])
+        for key in keys:
+            data = self._pending.get(key)
+            if data is not None and data is not _DELETED:
+                results[key] = data
+        return results
+
+    async def search(self, query : Dict[str,Any], limit : Optional[int] = None, descending : bool = False) -> List[Dict[str,Any]]:
+        return await call_memory(self._backend, "search", query, limit=limit, descending=descending)
+
+    async def query_range(self, conversation_id : str, since : Optional[float] = None, until : Optional[float] = None,
+                          limit : Optional[int] = None, descending : bool = False, cursor : Optional[str] = None) -> MemoryPage:
+        return await call_memory(self._backend, "query_range", conversation_id, since=since, until=until,
+                                 limit=limit, descending=descending, cursor=cursor)
@@ -0,0 +1,44 @@
+import dataclasses
+import pytest
+
+from config.settings import get_settings
+from memory.memory_interface import memory_key
+from memory.short_term import cache_memory
+from memory.short_term.cache_memory import CacheMemory
+
+
+@pytest.fixture
+def limited_settings(monkeypatch):
+    """Patches the cache limits seen by new CacheMemory instances."""
+    def apply(**overrides):
+        monkeypatch.setattr(cache_memory, "get_settings", lambda: dataclasses.replace(get_settings(), **overrides))
+    return apply
+
+
+def save_messages(cache, conversation_id, count, start=0.0):
+    for position in range(count):
+        data = {"conversation_id": conversation_id, "role": "user", "content": f"m{position}", "timestamp": start + position}
+        assert cache.save(memory_key(conversation_id, data), data)
+
+
+def test_one_conversation_can_use_the_whole_capacity(limited_settings):
+    limited_settings(cache_max_size=1000, cache_shards=16)
+    cache = CacheMemory()
+    save_messages(cache, "conv", 100)
+
+    assert len(cache.search({"conversation_id": "conv"})) == 100
+    assert cache.stats()["evictions"] == 0
+
+
+def test_eviction_is_least_recently_used_across_shards(limited_settings):
+    limited_settings(cache_max_size=30, cache_shards=8)
+    cache = CacheMemory()
+    conversations = [f"conv-{n}" for n in range(5)]
+    for n, conversation_id in enumerate(conversations):
+        save_messages(cache, conversation_id, 10, start=n * 100)
+
+    stats = cache.stats()
+    assert stats["entries"] == 30
+    assert stats["evictions"] == 20
+    # The oldest conversations went first, wherever their shards were
+    assert [len(cache.search({"conversation_id": c})) for c in conversations] == [0, 0, 10, 10, 10]
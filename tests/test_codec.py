@@ -0,0 +1,99 @@
+import pytest
+
+from memory.codec import MessageCodec, JSONCodec
+from memory.long_term.mongodb_memory import MongoDBMemory
+from memory.long_term.mysql_memory import INDEXED_COLUMNS, filter_rows, message_to_row
+
+MESSAGES = [
+    {"conversation_id": "conv", "role": "user", "content": "2+2", "timestamp": 1.0},
+    {"conversation_id": "conv", "role": "assistant", "content": "4", "timestamp": 2.0,
+     "tool_results": [{"tool_name": "calculator"}]},
+    {"conversation_id": "conv", "role": "user", "content": "2+2", "timestamp": 3.0},
+]
+
+
+def json_codec():
+    return MessageCodec(JSONCodec(), compress_threshold=0)
+
+
+def test_split_query_separates_encoded_fields():
+    stored, encoded = json_codec().split_query({"conversation_id": "conv", "content": "4"})
+    assert stored == {"conversation_id": "conv"}
+    assert encoded == {"content": "4"}
+
+
+def test_split_query_keeps_everything_stored_without_a_codec():
+    query = {"conversation_id": "conv", "content": "4"}
+    assert MessageCodec(None).split_query(query) == (query, {})
+
+
+@pytest.mark.parametrize("query", [
+    {"tool_results.tool_name": "calculator"},
+    {"content": {"$regex": "2"}},
+    {"$or": [{"role": "user"}, {"content": "4"}]},
+])
+def test_split_query_rejects_what_cannot_be_matched_after_decoding(query):
+    with pytest.raises(ValueError):
+        json_codec().split_query(query)
+
+
+def test_mysql_rows_match_encoded_fields_after_decoding():
+    codec = json_codec().with_clear_fields(INDEXED_COLUMNS)
+    rows = [message_to_row(codec, message) for message in MESSAGES]
+    _, encoded = codec.split_query({"content": "2+2"})
+
+    assert [m["timestamp"] for m in filter_rows(rows, encoded, None)] == [1.0, 3.0]
+    assert [m["timestamp"] for m in filter_rows(rows, encoded, 1)] == [1.0]
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self._documents = documents
+
+    def sort(self, field, direction):
+        self._documents.sort(key=lambda document: document[field], reverse=direction < 0)
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def limit(self, limit):
+        self._documents = self._documents[:limit]
+        return self
+
+    def __iter__(self):
+        return iter(self._documents)
+
+
+class FakeCollection:
+    """Matches top-level equality only, like a server looking at the stored documents."""
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, query, projection=None):
+        return FakeCursor([
+            dict(document) for document in self.documents
+            if all(document.get(field) == value for field, value in query.items())
+        ])
+
+
+def mongo_memory(codec):
+    memory = MongoDBMemory.__new__(MongoDBMemory)
+    memory._codec = codec
+    memory._collection = FakeCollection([{"_id": str(n), **codec.pack(m)} for n, m in enumerate(MESSAGES)])
+    return memory
+
+
+def test_mongo_search_matches_encoded_fields():
+    memory = mongo_memory(json_codec())
+
+    assert [m["timestamp"] for m in memory.search({"content": "2+2"})] == [1.0, 3.0]
+    assert [m["timestamp"] for m in memory.search({"content": "2+2"}, limit=1, descending=True)] == [3.0]
+    found = memory.search({"tool_results": [{"tool_name": "calculator"}]}, projection=["timestamp"])
+    assert found == [{"timestamp": 2.0}]
+
+
+def test_mongo_search_raises_instead_of_returning_nothing():
+    with pytest.raises(ValueError):
+        mongo_memory(json_codec()).search({"tool_results.tool_name": "calculator"})
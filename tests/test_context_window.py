@@ -0,0 +1,23 @@
+from agents import context_window
+from agents.context_window import TokenCounter
+
+
+class OfflineTiktoken:
+    """Stands in for tiktoken on a host that cannot download encodings."""
+
+    @staticmethod
+    def encoding_for_model(model):
+        raise ConnectionError("no network")
+
+    @staticmethod
+    def get_encoding(name):
+        raise ConnectionError("no network")
+
+
+def test_counter_falls_back_to_estimate_when_encoding_cannot_load(monkeypatch):
+    monkeypatch.setattr(context_window, "tiktoken", OfflineTiktoken)
+    counter = TokenCounter("llama3-70b-8192")
+
+    assert counter.name == "approx"
+    assert counter.count("x" * 40) == 10
+    assert counter.truncate("abcdefgh", 1) == "efgh"
@@ -0,0 +1,116 @@
+from memory.memory_interface import memory_key
+from memory.long_term.conversation_buckets import (
+    KEY_FIELD, collect_messages, from_entry, group_by_conversation, page_messages, timestamp_bounds, to_entry
+)
+from memory.long_term.mongodb_conversation_memory import append_update
+from memory.long_term.mysql_conversation_memory import build_buckets_sql, escape_search_pattern
+
+
+def message(conversation_id, timestamp, content=None):
+    data = {"conversation_id": conversation_id, "role": "user", "content": content or f"m{timestamp}",
+            "timestamp": float(timestamp)}
+    return memory_key(conversation_id, data), data
+
+
+class Buckets:
+    """Buckets in read order, recording whose entries were read."""
+
+    def __init__(self, buckets, descending=False):
+        self._buckets = sorted(buckets, key=lambda bucket: bucket[1] if descending else bucket[0], reverse=descending)
+        self.read = []
+
+    def __iter__(self):
+        for index, (first_ts, last_ts, entries) in enumerate(self._buckets):
+            yield first_ts, last_ts, self._entries(index, entries)
+
+    def _entries(self, index, entries):
+        self.read.append(index)
+        yield from entries
+
+
+def bucketed(conversation_id, timestamps, bucket_size, descending=False):
+    items = dict(message(conversation_id, timestamp) for timestamp in timestamps)
+    buckets = [(*timestamp_bounds(entries), entries) for _, entries in group_by_conversation(items, bucket_size)]
+    return Buckets(buckets, descending)
+
+
+def test_entries_round_trip_their_key():
+    key, data = message("conv", 1)
+    entry = to_entry(key, data)
+    assert entry[KEY_FIELD] == key
+    assert from_entry(entry) == (key, data)
+
+
+def test_group_by_conversation_rolls_over_at_bucket_size():
+    items = dict(message("conv_1", timestamp) for timestamp in [5, 1, 4, 2, 3])
+    items.update([message("conv_2", 1)])
+
+    appends = group_by_conversation(items, 2)
+    assert [(conversation_id, [entry["timestamp"] for entry in entries]) for conversation_id, entries in appends] == [
+        ("conv_1", [1.0, 2.0]), ("conv_1", [3.0, 4.0]), ("conv_1", [5.0]), ("conv_2", [1.0])
+    ]
+    assert timestamp_bounds(appends[1][1]) == (3.0, 4.0)
+
+
+def test_collect_messages_keeps_the_latest_copy_of_a_key():
+    key, data = message("conv", 1)
+    newer = dict(data, content="edited")
+    buckets = Buckets([(1.0, 1.0, [to_entry(key, data)]), (1.0, 2.0, [to_entry(key, newer), to_entry(*message("conv", 2))])])
+
+    assert [d["content"] for _, d in collect_messages(buckets, {})] == ["edited", "m2"]
+    assert [d["content"] for _, d in collect_messages(buckets, {"content": "m1"})] == []
+
+
+def test_collect_messages_stops_at_the_first_bucket_past_the_limit():
+    buckets = bucketed("conv", range(10), 2)
+    assert [d["timestamp"] for _, d in collect_messages(buckets, {}, limit=3)] == [0.0, 1.0, 2.0]
+    assert buckets.read == [0, 1]
+
+    buckets = bucketed("conv", range(10), 2, descending=True)
+    assert [d["timestamp"] for _, d in collect_messages(buckets, {}, limit=3, descending=True)] == [9.0, 8.0, 7.0]
+    assert buckets.read == [0, 1]
+
+
+def test_page_messages_pages_across_buckets():
+    buckets = bucketed("conv", range(7), 3)
+    seen, cursor = [], None
+    while True:
+        page = page_messages(buckets, None, None, 2, False, cursor)
+        seen.extend(d["timestamp"] for d in page.items)
+        if page.next_cursor is None:
+            break
+        cursor = page.next_cursor
+    assert seen == [float(t) for t in range(7)]
+
+    buckets = bucketed("conv", range(7), 3, descending=True)
+    first = page_messages(buckets, 1.0, 6.0, 2, True, None)
+    assert [d["timestamp"] for d in first.items] == [5.0, 4.0]
+    buckets.read.clear()
+    rest = page_messages(buckets, 1.0, 6.0, 10, True, first.next_cursor)
+    assert [d["timestamp"] for d in rest.items] == [3.0, 2.0, 1.0]
+    # The newest bucket holds 6.0 only, past the cursor and never decoded
+    assert 0 not in buckets.read
+
+
+def test_build_buckets_sql_continues_after_the_last_row():
+    sql, params = build_buckets_sql(["conv"], True, since=1.0, after=(5.0, 7), limit=8)
+    assert "(last_ts < %s OR (last_ts = %s AND id < %s))" in sql
+    assert sql.endswith("ORDER BY last_ts DESC, id DESC LIMIT %s")
+    assert params[-4:] == (5.0, 5.0, 7, 8)
+
+    sql, params = build_buckets_sql(None, False)
+    assert "(first_ts > %s" not in sql
+    assert sql.endswith("ORDER BY first_ts ASC, id ASC")
+    assert params == ()
+
+
+def test_escape_search_pattern_matches_wildcards_literally():
+    assert escape_search_pattern("conv_1:50%\\") == "conv\\_1:50\\%\\\\"
+
+
+def test_append_update_only_fills_a_bucket_with_room():
+    entries = [to_entry(*message("conv", timestamp)) for timestamp in [1, 2, 3]]
+    update = append_update("conv", entries, 10)
+    assert update._filter == {"conversation_id": "conv", "count": {"$lte": 7}}
+    assert update._doc["$inc"] == {"count": 3}
+    assert update._doc["$min"] == {"first_ts": 1.0} and update._doc["$max"] == {"last_ts": 3.0}
@@ -0,0 +1,32 @@
+import copy
+import pickle
+
+from memory.message import Message
+
+
+def make_message():
+    return Message(
+        conversation_id="conv",
+        role="assistant",
+        content="4",
+        timestamp=1.5,
+        tool_results=[{"tool_name": "calculator", "output": {"result": 4}}],
+        pinned=True
+    )
+
+
+def test_message_survives_copy_deepcopy_and_pickle():
+    message = make_message()
+
+    for clone in (copy.copy(message), copy.deepcopy(message), pickle.loads(pickle.dumps(message))):
+        assert isinstance(clone, Message)
+        assert clone == message
+        assert dict(clone) == dict(message)
+
+
+def test_deepcopy_does_not_share_nested_values():
+    message = make_message()
+    clone = copy.deepcopy(message)
+
+    clone["tool_results"][0]["output"]["result"] = 5
+    assert message["tool_results"][0]["output"]["result"] == 4
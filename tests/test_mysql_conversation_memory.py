@@ -0,0 +1,144 @@
+import json
+import re
+import sqlite3
+import pytest
+
+from memory.memory_interface import memory_key
+from memory.long_term.conversation_buckets import group_by_conversation, timestamp_bounds
+from memory.long_term.mysql_conversation_memory import BUCKET_PAGE_SIZE, MySQLConversationMemory
+
+
+def _like(value, pattern):
+    """MySQL LIKE with backslash escapes, as JSON_SEARCH applies it."""
+    regex = ""
+    escaped = False
+    for char in pattern:
+        if escaped:
+            regex += re.escape(char)
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == "%":
+            regex += ".*"
+        elif char == "_":
+            regex += "."
+        else:
+            regex += re.escape(char)
+    return re.fullmatch(regex, value, re.DOTALL) is not None
+
+
+def _json_search(document, one_or_all, pattern, escape, path):
+    # Only the '$[*].<member>' paths the bucket SQL uses
+    member = path.split(".", 1)[1]
+    for position, element in enumerate(json.loads(document)):
+        if isinstance(element, dict) and isinstance(element.get(member), str) and _like(element[member], pattern):
+            return json.dumps(f"$[{position}].{member}")
+    return None
+
+
+class BucketTable:
+    """
+    memory_conversations in sqlite, running the backend's statements as they are.
+
+    sqlite's json_remove takes the same paths as MySQL's. JSON_SEARCH,
+    JSON_UNQUOTE and SUBSTRING_INDEX follow the MySQL documentation.
+    """
+
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute(
+            "CREATE TABLE memory_conversations (id INTEGER PRIMARY KEY AUTOINCREMENT, conversation_id TEXT, "
+            "message_count INT, first_ts REAL, last_ts REAL, messages TEXT)"
+        )
+        self.conn.create_function("JSON_SEARCH", 5, _json_search)
+        self.conn.create_function("JSON_UNQUOTE", 1, lambda value: None if value is None else json.loads(value))
+        self.conn.create_function(
+            "SUBSTRING_INDEX", 3, lambda value, delimiter, count: None if value is None else delimiter.join(value.split(delimiter)[:count])
+        )
+
+    def execute(self, sql, params=(), fetch=False, prepared=True):
+        cursor = self.conn.execute(sql.replace("%s", "?"), params)
+        return cursor.fetchall() if fetch else cursor.rowcount
+
+    def insert(self, memory, items):
+        """One bucket per call, stored the way the backend's append stores it."""
+        for conversation_id, entries in group_by_conversation(items, 1000):
+            first_ts, last_ts = timestamp_bounds(entries)
+            messages = json.dumps([memory._codec.pack(entry, text=True) for entry in entries])
+            self.conn.execute(
+                "INSERT INTO memory_conversations (conversation_id, message_count, first_ts, last_ts, messages) "
+                "VALUES (?, ?, ?, ?, ?)", (conversation_id, len(entries), first_ts, last_ts, messages)
+            )
+
+    def counts(self):
+        return [row[0] for row in self.conn.execute("SELECT message_count FROM memory_conversations ORDER BY id")]
+
+
+def messages(conversation_id, timestamps):
+    items = {}
+    for timestamp in timestamps:
+        data = {"conversation_id": conversation_id, "role": "user", "content": f"m{timestamp}", "timestamp": float(timestamp)}
+        items[memory_key(conversation_id, data)] = data
+    return items
+
+
+@pytest.fixture
+def table(monkeypatch):
+    table = BucketTable()
+    monkeypatch.setattr(MySQLConversationMemory, "_create_table", lambda self: None)
+    monkeypatch.setattr(MySQLConversationMemory, "_execute", lambda self, *args, **kwargs: table.execute(*args, **kwargs))
+    return table
+
+
+def test_delete_removes_the_whole_entry_and_keeps_the_others(table):
+    memory = MySQLConversationMemory(pool_size=1, bucket_size=10)
+    items = messages("conv_1", [1, 2, 3])
+    table.insert(memory, items)
+    deleted_key = memory_key("conv_1", {"timestamp": 2.0})
+
+    assert memory.delete(deleted_key)
+
+    history = memory.search({"conversation_id": "conv_1"})
+    assert [m["content"] for m in history] == ["m1", "m3"]
+    assert memory.load(deleted_key) is None
+    assert memory.load(memory_key("conv_1", {"timestamp": 3.0}))["content"] == "m3"
+    assert table.counts() == [2]
+    assert not memory.delete(deleted_key)
+
+
+def test_delete_removes_every_copy_of_a_key(table):
+    memory = MySQLConversationMemory(pool_size=1, bucket_size=10)
+    items = messages("conv_1", [1, 2])
+    table.insert(memory, items)
+    # A later save of the same key lands in another bucket
+    table.insert(memory, messages("conv_1", [2]))
+
+    assert memory.delete(memory_key("conv_1", {"timestamp": 2.0}))
+    assert [m["content"] for m in memory.search({"conversation_id": "conv_1"})] == ["m1"]
+    assert table.counts() == [1, 0]
+
+
+def test_reads_page_through_buckets_and_stop_once_the_limit_is_met(table, monkeypatch):
+    memory = MySQLConversationMemory(pool_size=1, bucket_size=10)
+    count = BUCKET_PAGE_SIZE * 2 + 3
+    for timestamp in range(count):
+        table.insert(memory, messages("conv_1", [timestamp]))
+    # Same timestamps as the bucket above, the keyset tie-breaks on id
+    table.insert(memory, messages("conv_1", [count - 1]))
+    queries = []
+    execute = table.execute
+    monkeypatch.setattr(table, "execute", lambda sql, *args, **kwargs: queries.append(sql) or execute(sql, *args, **kwargs))
+
+    history = memory.search({"conversation_id": "conv_1"})
+    assert [m["timestamp"] for m in history] == [float(t) for t in range(count)]
+    assert len(queries) == 3
+
+    queries.clear()
+    latest = memory.search({"conversation_id": "conv_1"}, limit=2, descending=True)
+    assert [m["timestamp"] for m in latest] == [float(count - 1), float(count - 2)]
+    assert len(queries) == 1
+
+    page = memory.query_range("conv_1", limit=BUCKET_PAGE_SIZE + 1)
+    assert [m["timestamp"] for m in page.items] == [float(t) for t in range(BUCKET_PAGE_SIZE + 1)]
+    rest = memory.query_range("conv_1", cursor=page.next_cursor)
+    assert [m["timestamp"] for m in rest.items] == [float(t) for t in range(BUCKET_PAGE_SIZE + 1, count)]
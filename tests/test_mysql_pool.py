@@ -0,0 +1,70 @@
+import threading
+import time
+import pytest
+
+from memory.long_term.mysql_memory import MySQLMemory
+
+
+class FakePooled:
+    def __init__(self):
+        self.last_used = time.monotonic()
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def memory(monkeypatch):
+    monkeypatch.setattr(MySQLMemory, "_create_table", lambda self: None)
+    monkeypatch.setattr(MySQLMemory, "_new_pooled", lambda self: FakePooled())
+    return MySQLMemory(pool_size=1, pool_timeout=5)
+
+
+def checkout_in_thread(memory):
+    result = {}
+
+    def run():
+        started = time.monotonic()
+        try:
+            result["pooled"] = memory._checkout()
+        except Exception as e:
+            result["error"] = e
+        result["waited"] = time.monotonic() - started
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, result
+
+
+def test_waiter_gets_a_new_connection_when_one_is_discarded(memory):
+    broken = memory._checkout()
+    thread, result = checkout_in_thread(memory)
+    time.sleep(0.1)
+
+    memory._discard(broken)
+    thread.join(timeout=2)
+
+    assert "error" not in result
+    assert result["pooled"] is not broken
+    assert result["waited"] < 1
+
+
+def test_waiter_gets_a_checked_in_connection(memory):
+    pooled = memory._checkout()
+    thread, result = checkout_in_thread(memory)
+    time.sleep(0.1)
+
+    memory._checkin(pooled)
+    thread.join(timeout=2)
+
+    assert result["pooled"] is pooled
+    assert result["waited"] < 1
+
+
+def test_checkout_times_out_when_the_pool_stays_busy(memory):
+    memory._pool_timeout = 0.2
+    memory._checkout()
+
+    with pytest.raises(TimeoutError):
+        memory._checkout()
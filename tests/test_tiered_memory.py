@@ -0,0 +1,64 @@
+import asyncio
+import dataclasses
+import pytest
+
+from config.settings import get_settings
+from memory.memory_interface import MemoryPage
+from memory.short_term import cache_memory
+from memory.short_term.cache_memory import CacheMemory
+from memory.tiered_memory import TieredMemory
+
+
+class FakeLongTerm:
+    """Long-term store holding one conversation, records the limit of every range read."""
+
+    blocking = False
+
+    def __init__(self, conversation_id, count):
+        self.messages = [
+            {"conversation_id": conversation_id, "role": "user", "content": f"m{n}", "timestamp": float(n)}
+            for n in range(count)
+        ]
+        self.reads = []
+
+    def query_range(self, conversation_id, since=None, until=None, limit=None, descending=False, cursor=None):
+        self.reads.append(limit)
+        items = [m for m in self.messages if m["conversation_id"] == conversation_id]
+        if descending:
+            items.reverse()
+        return MemoryPage(items[:limit], None)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    settings = dataclasses.replace(get_settings(), cache_max_size=50, cache_shards=16)
+    monkeypatch.setattr(cache_memory, "get_settings", lambda: settings)
+    return CacheMemory()
+
+
+def test_warmup_is_capped_at_the_cache_capacity(cache):
+    long_term = FakeLongTerm("conv", 300)
+    memory = TieredMemory(cache, long_term, warmup_limit=200)
+    history = asyncio.run(memory.search({"conversation_id": "conv"}))
+
+    assert long_term.reads == [50]
+    assert len(history) == 50
+    assert cache.stats()["evictions"] == 0
+
+
+def test_warmup_reads_only_what_the_caller_asked_for(cache):
+    long_term = FakeLongTerm("conv", 300)
+    memory = TieredMemory(cache, long_term, warmup_limit=200)
+
+    async def scenario():
+        newest = await memory.search({"conversation_id": "conv"}, limit=10, descending=True)
+        again = await memory.search({"conversation_id": "conv"}, limit=10, descending=True)
+        # A caller that needs the full history gets a deeper read
+        full = await memory.search({"conversation_id": "conv"})
+        return newest, again, full
+
+    newest, again, full = asyncio.run(scenario())
+    assert [m["content"] for m in newest] == [f"m{n}" for n in range(299, 289, -1)]
+    assert again == newest
+    assert long_term.reads == [10, 50]
+    assert len(full) == 50
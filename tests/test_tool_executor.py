@@ -0,0 +1,135 @@
+import asyncio
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import tool
+from agents.tool_executor import ToolExecutor
+from tools.registry import ToolRegistry
+
+
+@tool
+def shout(text: str) -> str:
+    """Upper-case the text."""
+    return text.upper()
+
+
+@tool
+async def whisper(text: str) -> str:
+    """Lower-case the text."""
+    await asyncio.sleep(0.05)
+    return text.lower()
+
+
+@tool
+def fail(text: str) -> str:
+    """Always raises."""
+    raise ValueError(f"cannot handle {text}")
+
+
+async def stream_tool_events(executor, calls):
+    """Runs the calls inside a streamed runnable, as the orchestrator graph does, and collects the tool events."""
+    async def run(_):
+        return await executor.run_all(calls)
+
+    events, results = [], None
+    async for event in RunnableLambda(run).astream_events({}, version="v2"):
+        if event["event"] in ("on_tool_start", "on_tool_end"):
+            events.append((event["event"], event["name"]))
+        elif event["event"] == "on_chain_end" and not event.get("parent_ids"):
+            results = event["data"]["output"]
+    return events, results
+
+
+def test_sync_tool_emits_stream_events():
+    executor = ToolExecutor(ToolRegistry([shout]))
+    events, results = asyncio.run(stream_tool_events(executor, [("shout", shout, {"text": "hi"})]))
+
+    assert events == [("on_tool_start", "shout"), ("on_tool_end", "shout")]
+    assert results == [{"tool_name": "shout", "input": {"text": "hi"}, "output": "HI"}]
+
+
+def test_results_keep_call_order_and_errors_are_isolated():
+    executor = ToolExecutor(ToolRegistry([shout, whisper, fail]))
+    calls = [("whisper", whisper, {"text": "A"}), ("fail", fail, {"text": "b"}), ("shout", shout, {"text": "c"})]
+    events, results = asyncio.run(stream_tool_events(executor, calls))
+
+    assert [result["tool_name"] for result in results] == ["whisper", "fail", "shout"]
+    assert results[0]["output"] == "a"
+    assert "cannot handle b" in results[1]["error"]
+    assert results[2]["output"] == "C"
+    assert sorted(name for kind, name in events if kind == "on_tool_start") == ["fail", "shout", "whisper"]
+
+
+@pytest.fixture
+def process_pool(monkeypatch):
+    """A one-worker pool with a tight CPU limit in place of the shared one."""
+    from agents import tool_executor
+    from agents.tool_process_pool import ToolProcessPool
+
+    pool = ToolProcessPool(size=1, cpu_limit=1)
+    monkeypatch.setattr(tool_executor, "get_tool_process_pool", lambda: pool)
+    yield pool
+    pool.close()
+
+
+def test_isolated_tool_emits_stream_events(process_pool):
+    from tools import get_tool_registry
+
+    registry = get_tool_registry()
+    calculator = registry.get("calculator")
+    assert registry.is_isolated("calculator")
+
+    events, results = asyncio.run(stream_tool_events(
+        ToolExecutor(registry), [("calculator", calculator, {"expression": "2+3"})]
+    ))
+
+    assert events == [("on_tool_start", "calculator"), ("on_tool_end", "calculator")]
+    assert results[0]["output"]["result"] == 5
+
+
+def test_isolated_tool_is_killed_past_its_cpu_limit(process_pool):
+    from tools import get_tool_registry
+
+    registry = get_tool_registry()
+    events, results = asyncio.run(stream_tool_events(
+        ToolExecutor(registry), [("calculator", registry.get("calculator"), {"expression": "9**9**9**9"})]
+    ))
+
+    assert ("on_tool_start", "calculator") in events
+    assert "exceeded its CPU or memory limit" in results[0]["error"]
+
+
+def test_process_pool_frees_the_slot_when_a_worker_cannot_start(process_pool, monkeypatch):
+    def spawn_fails():
+        raise OSError("no processes left")
+
+    async def scenario():
+        # The only worker dies on its limit and no replacement can start
+        spawn = process_pool._spawn
+        monkeypatch.setattr(process_pool, "_spawn", spawn_fails)
+        with pytest.raises(RuntimeError, match="exceeded its CPU or memory limit"):
+            await process_pool.run("calculator", {"expression": "9**9**9**9"})
+        await asyncio.sleep(0.1)
+        with pytest.raises(RuntimeError, match="No tool worker could be started"):
+            await asyncio.wait_for(process_pool.run("calculator", {"expression": "1+1"}), 5)
+
+        monkeypatch.setattr(process_pool, "_spawn", spawn)
+        assert (await asyncio.wait_for(process_pool.run("calculator", {"expression": "1+1"}), 30))["result"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_process_pool_close_kills_busy_workers(process_pool):
+    async def scenario():
+        call = asyncio.ensure_future(process_pool.run("calculator", {"expression": "9**9**9**9"}))
+        while not process_pool._busy:
+            await asyncio.sleep(0.01)
+        worker = next(iter(process_pool._busy))
+        process_pool.close()
+        assert not worker.process.is_alive()
+        with pytest.raises(RuntimeError, match="closed"):
+            await call
+
+    asyncio.run(scenario())
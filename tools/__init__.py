@@ -1,8 +1,16 @@
+from functools import lru_cache
 from tools.calculator import calculator
 from tools.text_converter import text_converter
+from tools.registry import ToolRegistry
 
 def get_all_tools():
     return [
         calculator,
         text_converter
-    ]
\ No newline at end of file
+    ]
+
+@lru_cache(maxsize=None)
+def get_tool_registry() -> ToolRegistry:
+    """Registry of all tools, specs generated on first call and shared by the agents."""
+    # calculator evals model input, 9**9**9**9 would hold a core for minutes
+    return ToolRegistry(get_all_tools(), isolated={"calculator"})
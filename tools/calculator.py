@@ -35,10 +35,3 @@ def calculator(expression: str) -> Dict[str, any]:
             "message": f"Error evaluating expression: {str(e)}",
             "input_expression": expression
         }
-
-    except Exception as e:
-        return {
-            "status": "error",
-            "message": f"Error evaluating expression: {str(e)}",
-            "input_expression": expression
-        }
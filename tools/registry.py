@@ -0,0 +1,64 @@
+import json
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, Optional, Tuple
+from config.settings import get_settings
+
+def build_tool_spec(tool: Any) -> Dict[str, Any]:
+    """OpenAI-style function spec for a LangChain tool, as the providers expect it."""
+    return {
+        "type": "function",
+        "function": {
+            "name": tool.name,
+            "description": tool.description,
+            "parameters": tool.args_schema.schema() if hasattr(tool, 'args_schema') else {"type": "object", "properties": {}}
+        }
+    }
+
+class ToolRegistry:
+    """
+    The tools an agent can call, prepared once.
+
+    Provider specs (including the pydantic JSON schemas) are generated when the
+    registry is built and kept as an immutable tuple, tools are looked up by
+    name in O(1), and bind() pre-binds the specs to a chat client so no tool
+    setup happens per request. Specs must not be modified after construction.
+    timeouts maps tool names to their own execution timeout in seconds, and
+    tools named in isolated run in the CPU- and memory-limited process pool.
+    """
+
+    def __init__(self, tools: Iterable[Any] = (), timeouts: Optional[Dict[str, float]] = None,
+                 isolated: Iterable[str] = ()):
+        tools = list(tools)
+        self._tools = MappingProxyType({tool.name: tool for tool in tools})
+        self._timeouts = MappingProxyType(dict(timeouts or {}))
+        self.isolated: FrozenSet[str] = frozenset(isolated)
+        self.specs: Tuple[Dict[str, Any], ...] = tuple(build_tool_spec(tool) for tool in tools)
+        # Canonical form, for logging and for hashing the specs without re-serializing them
+        self.specs_json = json.dumps(self.specs, sort_keys=True, separators=(",", ":"))
+
+    def get(self, name: str) -> Optional[Any]:
+        return self._tools.get(name)
+
+    def timeout_for(self, name: str) -> float:
+        return self._timeouts.get(name, get_settings().tool_timeout)
+
+    def is_isolated(self, name: str) -> bool:
+        return name in self.isolated
+
+    def names(self) -> Tuple[str, ...]:
+        return tuple(self._tools)
+
+    def bind(self, client: Any) -> Optional[Any]:
+        """client with the tool specs bound, or None when there are no tools."""
+        if not self.specs:
+            return None
+        return client.bind_tools(list(self.specs))
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._tools.values())
+
+    def __len__(self) -> int:
+        return len(self._tools)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools